@@ -3,6 +3,8 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.policies import DEFAULT_POLICY, resolve_policies
+from api.v1.json_provider import FastJSONProvider
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
@@ -10,9 +12,11 @@ import os
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+policies = resolve_policies(app)
 auth_type = getenv('AUTH_TYPE')
 if auth_type:
     if auth_type == 'auth':
@@ -53,10 +57,11 @@ def before_request():
     """
     if auth is None:
         return
-    excluded_paths = ['/api/v1/status/', '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/', '/api/v1/auth_session/login/']
-    if not auth.require_auth(request.path, excluded_paths):
+    policy = policies.get(request.endpoint, DEFAULT_POLICY)
+    if policy.public:
         return
+    if not policy.allows(auth_type):
+        abort(401)
     cookie = auth.session_cookie(request)
     if auth.authorization_header(request) is None and cookie is None:
         abort(401)
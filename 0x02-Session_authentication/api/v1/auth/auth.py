@@ -5,6 +5,7 @@ Auth management for the API
 from typing import List, TypeVar
 from flask import request
 from os import getenv
+from api.v1.auth.path_matcher import PathMatcher, compile_paths
 
 
 class Auth:
@@ -17,7 +18,7 @@ class Auth:
         Args:
             - path(str): Url path to be checked
             - excluded_paths(List of str): List of paths that do not require
-              authentication
+              authentication, or the PathMatcher compiled from it
         Return:
             - True if path is not in excluded_paths, else False
         """
@@ -29,23 +30,11 @@ class Auth:
         if excluded_paths is None or len(excluded_paths) == 0:
             return True
 
-        # Normalize the path by removing trailing slashes
-        normalized_path = path.rstrip('/')
-
-        # Step 3: Loop through excluded_paths and
-        # check if normalized path matches
-        for excluded_path in excluded_paths:
-            normalized_excluded_path = excluded_path.rstrip('/')
-            if normalized_path == normalized_excluded_path:
-                return False
-            # Check for wildcard match
-            if normalized_excluded_path.endswith('*'):
-                # Remove '/*' from the end
-                if normalized_path.startswith(normalized_excluded_path[:-1]):
-                    return False
-
-        # If no match found, return True (authentication required)
-        return True
+        # Step 3: Match the path against the compiled excluded paths
+        # (trailing slashes ignored, `*` matching any suffix)
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -4,7 +4,9 @@ BasicAuth management for the API
 """
 from typing import List, TypeVar
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import CredentialCache
 import base64
+from os import getenv
 from typing import TypeVar
 from models.user import User
 
@@ -12,7 +14,13 @@ from models.user import User
 class BasicAuth(Auth):
     """
     Basic API Auth management class
+    Verified Authorization headers are cached (BASIC_AUTH_CACHE_SIZE
+    entries for BASIC_AUTH_CACHE_TTL seconds, 0 to disable)
     """
+    credential_cache = CredentialCache(
+        int(getenv('BASIC_AUTH_CACHE_SIZE', 1024)),
+        float(getenv('BASIC_AUTH_CACHE_TTL', 300)))
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         """
@@ -84,14 +92,23 @@ class BasicAuth(Auth):
     def current_user(self, request=None) -> TypeVar('User'):
         """
         Returns a User instance based on a received request
+        A header already verified is answered from the credential cache,
+        without decoding it nor checking the password again
         """
         Auth_header = self.authorization_header(request)
         if Auth_header is not None:
+            user = self.credential_cache.get(Auth_header)
+            if user is not None:
+                return user
             token = self.extract_base64_authorization_header(Auth_header)
             if token is not None:
                 decoded = self.decode_base64_authorization_header(token)
                 if decoded is not None:
                     email, pword = self.extract_user_credentials(decoded)
                     if email is not None:
-                        return self.user_object_from_credentials(email, pword)
+                        user = self.user_object_from_credentials(email,
+                                                                 pword)
+                        if user is not None:
+                            self.credential_cache.add(Auth_header, user)
+                        return user
         return
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Cache of verified Basic credentials
+"""
+from collections import OrderedDict
+from typing import TypeVar
+import hashlib
+import hmac
+import os
+import threading
+import time
+from models.user import User
+
+
+class CredentialCache:
+    """
+    Bounded LRU of the Authorization headers already verified, keyed by
+    a keyed digest of the header (the credentials themselves are never
+    kept), mapping to the user id, the email and the password hash it was
+    verified against, for `ttl` seconds
+    An entry is only used while the user still exists with the same email
+    and password hash, so changing the password or removing the user
+    invalidates it
+    """
+    def __init__(self, size: int = 1024, ttl: float = 300.0,
+                 secret: bytes = None):
+        """
+        Initialize an empty cache, keyed with a random secret by default
+        """
+        self.size = size
+        self.ttl = ttl
+        self._secret = secret or os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, header: str) -> bytes:
+        """
+        Return the keyed digest of an Authorization header
+        """
+        return hmac.new(self._secret, header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, header: str) -> TypeVar('User'):
+        """
+        Return the user verified for `header`, None if it is not cached,
+        expired or no longer valid
+        """
+        if self.size <= 0:
+            return None
+        key = self.digest(header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, email, password, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(user_id)
+        if user is None or user.email != email or \
+                user.password != password:
+            self.discard(header)
+            return None
+        return user
+
+    def add(self, header: str, user: TypeVar('User')):
+        """
+        Cache `user` as verified for `header`
+        """
+        if self.size <= 0:
+            return
+        key = self.digest(header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, header: str):
+        """
+        Drop the entry of `header`
+        """
+        key = self.digest(header)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
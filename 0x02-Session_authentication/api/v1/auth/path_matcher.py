@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compiled matcher of the paths excluded from authentication
+"""
+from functools import lru_cache
+from typing import Iterable, Iterator, Tuple
+
+
+class PathMatcher:
+    """
+    Paths excluded from authentication, compiled once: a set of the
+    exact paths and a trie of the prefixes of the `*` patterns, both
+    without trailing slashes
+    A path is excluded if, once stripped of its trailing slashes, it is
+    one of the exact paths or starts with one of the prefixes
+    """
+    def __init__(self, excluded_paths: Iterable[str]):
+        """
+        Compile `excluded_paths`
+        """
+        self.patterns = tuple(excluded_paths)
+        self.exact = set()
+        self.prefixes = {}
+        self.any = False
+        for pattern in self.patterns:
+            normalized = pattern.rstrip('/')
+            self.exact.add(normalized)
+            if normalized.endswith('*'):
+                self.add_prefix(normalized[:-1])
+
+    def add_prefix(self, prefix: str):
+        """
+        Add a `*` pattern prefix to the trie
+        """
+        if prefix == '':
+            self.any = True
+            return
+        node = self.prefixes
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    def __len__(self) -> int:
+        """
+        Number of excluded paths
+        """
+        return len(self.patterns)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the excluded paths
+        """
+        return iter(self.patterns)
+
+    def match(self, path: str) -> bool:
+        """
+        Return True if `path` is excluded, in time linear in its length
+        """
+        if self.any:
+            return True
+        normalized = path.rstrip('/')
+        if normalized in self.exact:
+            return True
+        node = self.prefixes
+        for char in normalized:
+            node = node.get(char)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+@lru_cache(maxsize=64)
+def compile_paths(excluded_paths: Tuple[str]) -> PathMatcher:
+    """
+    Return the matcher of `excluded_paths`, compiled once per distinct
+    list
+    """
+    return PathMatcher(excluded_paths)
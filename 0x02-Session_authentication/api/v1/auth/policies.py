@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Per-route authentication policies of the API
+"""
+from typing import Callable, Iterable
+
+
+class AuthPolicy:
+    """
+    Authentication policy of a route: public, or requiring a user
+    authenticated with one of `schemes` (any scheme if None)
+    """
+    def __init__(self, public: bool = False, schemes: Iterable[str] = None):
+        """
+        Initialize a policy
+        """
+        self.public = public
+        self.schemes = None if schemes is None else frozenset(schemes)
+
+    def allows(self, scheme: str) -> bool:
+        """
+        Return True if a user authenticated with `scheme` (an AUTH_TYPE)
+        may access the route
+        """
+        return self.schemes is None or scheme in self.schemes
+
+
+DEFAULT_POLICY = AuthPolicy()
+PUBLIC_POLICY = AuthPolicy(public=True)
+
+
+def public(view: Callable) -> Callable:
+    """
+    Decorator of a view that does not require authentication
+    """
+    view.auth_policy = PUBLIC_POLICY
+    return view
+
+
+def auth_required(schemes: Iterable[str] = None) -> Callable:
+    """
+    Decorator of a view requiring a user authenticated with one of
+    `schemes` (any scheme by default, like an undecorated view)
+    """
+    policy = AuthPolicy(schemes=schemes)
+
+    def decorate(view: Callable) -> Callable:
+        """
+        Attach the policy to the view
+        """
+        view.auth_policy = policy
+        return view
+    return decorate
+
+
+def resolve_policies(app) -> dict:
+    """
+    Return the policy of every endpoint of the URL map of `app`, to be
+    built once all the routes are registered
+    """
+    policies = {}
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions.get(rule.endpoint)
+        policies[rule.endpoint] = getattr(view, 'auth_policy',
+                                          DEFAULT_POLICY)
+    return policies
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+""" JSON provider module
+"""
+from flask.json.provider import DefaultJSONProvider
+from models.jsonlib import COMPACT_SEPARATORS, get_json
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """ Flask JSON provider encoding compact responses (jsonify outside
+    debug mode) and decoding request bodies with the JSON library of the
+    models (orjson when installed), same text as the default provider
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        """ Serialize `obj` to JSON
+        """
+        if set(kwargs) == {'separators'} and self.ensure_ascii and \
+                kwargs['separators'] == COMPACT_SEPARATORS:
+            return get_json().dumps(obj, default=self.default,
+                                    sort_keys=self.sort_keys, compact=True)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """ Deserialize `s` from JSON
+        """
+        if len(kwargs) > 0:
+            return super().loads(s, **kwargs)
+        return get_json().loads(s)
@@ -2,10 +2,15 @@
 """ Module of Index views
 """
 from flask import jsonify, abort
+from api.v1.auth.policies import public
 from api.v1.views import app_views
 
 
+STATS_GROUPS = 100
+
+
 @app_views.route('/status', methods=['GET'], strict_slashes=False)
+@public
 def status() -> str:
     """ GET /api/v1/status
     Return:
@@ -19,14 +24,20 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the aggregates of each objects (users by email domain, by
+        signup day), maintained on every write, limited to their
+        STATS_GROUPS largest groups
     """
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    for name in User.aggregates:
+        stats[name] = User.aggregate(name, STATS_GROUPS)
     return jsonify(stats)
 
 
 @app_views.route('/unauthorized/', strict_slashes=False)
+@public
 def unauthorized_error() -> str:
     """ GET /api/v1/unauthorized
       Return:
@@ -36,6 +47,7 @@ def unauthorized_error() -> str:
 
 
 @app_views.route('/forbidden/', strict_slashes=False)
+@public
 def forbidden_error() -> str:
     """ GET /api/v1/forbidden
       Return:
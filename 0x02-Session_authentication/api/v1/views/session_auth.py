@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Views for session Auth
 """
+from api.v1.auth.policies import auth_required, public
 from api.v1.views import app_views
 from flask import abort, jsonify, request
 from models.user import User
@@ -8,6 +9,7 @@ from os import getenv
 
 
 @app_views.route('/auth_session/login', methods=['POST'], strict_slashes=False)
+@public
 def login():
     """ POST /api/v1/auth_session/login
     Return:
@@ -37,6 +39,7 @@ def login():
 
 @app_views.route('/auth_session/logout', methods=['DELETE'],
                  strict_slashes=False)
+@auth_required(schemes=['session_auth'])
 def logout():
     """ DELETE /api/v1/auth_session/logout
     Return:
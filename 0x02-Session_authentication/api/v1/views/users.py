@@ -2,18 +2,204 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, current_app, jsonify, make_response, \
+    request
+from os import getenv
+from typing import Callable, Iterator, List
 from models.user import User
 
 
+PAGE_SIZE = 100
+PAGE_SIZE_MAX = 1000
+BATCH_MAX = int(getenv('USERS_BATCH_MAX', 100))
+SEARCH_LIMIT = 20
+SEARCH_LIMIT_MAX = 100
+STREAM_CHUNK_SIZE = 100
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SEPARATORS = (",", ":")
+
+
+def user_serializer() -> Callable:
+    """ Return the function converting a User to its JSON dictionary,
+    restricted to the attributes of the `fields` query parameter (comma
+    separated) if any
+    Raise a ValueError if `fields` is not valid
+    """
+    fields = request.args.get('fields')
+    if fields is None:
+        return User.to_json
+    return User.projection(name.strip() for name in fields.split(",")
+                           if name.strip() != "")
+
+
+def conditional(etag: str, build: Callable) -> Response:
+    """ Return an empty 304 response if the If-None-Match header of the
+    request matches `etag`, else the response returned by `build()`,
+    both with the ETag header (none if `etag` is None)
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+def user_response(user: User, serialize: Callable) -> Response:
+    """ Return the JSON response of `user` converted by `serialize`, the
+    full representation coming from the encoded JSON cache of the user
+    """
+    if serialize is not User.to_json or current_app.debug:
+        return jsonify(serialize(user))
+    text = user.encoded_json(current_app.json.dumps, separators=SEPARATORS)
+    return current_app.response_class(text + "\n",
+                                      mimetype=current_app.json.mimetype)
+
+
+def batch_response(ids: List[str], serialize: Callable) -> Response:
+    """ Return the JSON response of the users found among `ids`, looked up
+    at once, and of the ids not found, both in request order
+    """
+    users = User.get_many(ids)
+    found = {user.id for user in users}
+    return jsonify({'users': [serialize(user) for user in users],
+                    'missing': [obj_id for obj_id in ids
+                                if obj_id not in found]})
+
+
+def stream_users(dumps: Callable, serialize: Callable,
+                 ndjson: bool = False) -> Iterator[str]:
+    """ Yield all users converted by `serialize` and JSON represented
+    with `dumps`, by chunks of STREAM_CHUNK_SIZE users: as a JSON array,
+    or one user per line for NDJSON
+    Nothing is cached on the users, so that memory stays flat
+    """
+    chunk = []
+    count = 0
+    if not ndjson:
+        yield "["
+    for user in User.all():
+        text = dumps(serialize(user), separators=SEPARATORS)
+        if ndjson:
+            chunk.append(text + "\n")
+        else:
+            chunk.append(text if count == 0 else "," + text)
+        count += 1
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if len(chunk) > 0:
+        yield "".join(chunk)
+    if not ndjson:
+        yield "]\n"
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size, at most PAGE_SIZE_MAX (1000)
+      - cursor: next_cursor of the previous page
+      - stream: 1 to stream the list of all User objects
+      - ids: comma separated User IDs, at most USERS_BATCH_MAX (100)
+      - fields: comma separated attributes to return (all by default)
     Return:
       - list of all User objects JSON represented
+      - with stream=1, the same list generated user by user; with an
+        `Accept: application/x-ndjson` header, one User object per line
+      - with limit or cursor: one page of User objects, in creation order,
+        and the next_cursor (null on the last page), in JSON whatever the
+        Accept header
+      - with ids: the User objects found and the missing IDs
+      - 400 if limit, cursor, ids or fields is not valid, or if stream=1
+        is combined with limit or cursor
+      - 304 if If-None-Match matches the ETag (changing with any User
+        saved or removed)
+    """
+    try:
+        serialize = user_serializer()
+    except ValueError:
+        return jsonify({'error': "Wrong fields"}), 400
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    paging = limit is not None or cursor is not None
+    ndjson = not paging and \
+        request.accept_mimetypes.best == NDJSON_MIMETYPE
+    etag = User.collection_etag("{}\0{}".format(
+        request.query_string.decode('latin-1'), ndjson))
+    if request.args.get('ids') is not None:
+        ids = list(dict.fromkeys(obj_id for obj_id in
+                                 request.args.get('ids').split(",")
+                                 if obj_id != ""))
+        if len(ids) == 0:
+            return jsonify({'error': "Wrong ids"}), 400
+        if len(ids) > BATCH_MAX:
+            return jsonify({'error': "Too many ids"}), 400
+        return conditional(etag, lambda: batch_response(ids, serialize))
+    if request.args.get('stream') == "1" and paging:
+        return jsonify({'error': "Wrong stream"}), 400
+    if request.args.get('stream') == "1" or ndjson:
+        mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+        return conditional(etag, lambda: Response(
+            stream_users(current_app.json.dumps, serialize, ndjson),
+            mimetype=mimetype))
+    if not paging:
+        return conditional(etag, lambda: jsonify(
+            [serialize(user) for user in User.all()]))
+    if limit is None:
+        limit = PAGE_SIZE
+    try:
+        limit = int(limit)
+        if limit < 1 or limit > PAGE_SIZE_MAX:
+            raise ValueError()
+    except ValueError:
+        return jsonify({'error': "Wrong limit"}), 400
+    if cursor is not None:
+        try:
+            User.decode_cursor(cursor, 'created_at')
+        except ValueError:
+            return jsonify({'error': "Wrong cursor"}), 400
+
+    def page() -> Response:
+        """ Response of the requested page
+        """
+        users, next_cursor = User.page(limit, cursor)
+        return jsonify({'users': [serialize(user) for user in users],
+                        'next_cursor': next_cursor})
+    return conditional(etag, page)
+
+
+@app_views.route('/users/search', methods=['GET'], strict_slashes=False)
+def search_users() -> str:
+    """ GET /api/v1/users/search
+    Query parameters:
+      - q: start of the email, or part of the first or last name (from 3
+        characters, ignoring case)
+      - limit (optional): maximum number of users, 20 by default, 100 at
+        most
+      - fields (optional): comma separated attributes to return (all by
+        default)
+    Return:
+      - list of the matching User objects JSON represented, email
+        matches first
+      - 400 if q, limit or fields is not valid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    try:
+        serialize = user_serializer()
+    except ValueError:
+        return jsonify({'error': "Wrong fields"}), 400
+    text = request.args.get('q', "")
+    if text == "":
+        return jsonify({'error': "q missing"}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+        if limit < 1 or limit > SEARCH_LIMIT_MAX:
+            raise ValueError()
+    except ValueError:
+        return jsonify({'error': "Wrong limit"}), 400
+    users = User.search_text(text, limit)
+    return jsonify([serialize(user) for user in users])
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -21,20 +207,31 @@ def view_one_user(user_id: str = None) -> str:
     """ GET /api/v1/users/:id
     Path parameter:
       - User ID
+    Query parameter (optional):
+      - fields: comma separated attributes to return (all by default)
     Return:
       - User object JSON represented
       - 404 if the User ID doesn't exist
+      - 400 if fields is not valid
+      - 304 if If-None-Match matches the ETag (changing with the User
+        updated_at)
     """
     if user_id is None:
         abort(404)
+    try:
+        serialize = user_serializer()
+    except ValueError:
+        return jsonify({'error': "Wrong fields"}), 400
     if user_id == "me":
         if request.current_user is None:
             abort(404)
-        return jsonify(request.current_user.to_json())
-    user = User.get(user_id)
+        user = request.current_user
+    else:
+        user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    etag = user.etag(request.args.get('fields', ""))
+    return conditional(etag, lambda: user_response(user, serialize))
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -65,7 +262,8 @@ def create_user() -> str:
       - first_name (optional)
     Return:
       - User object JSON represented
-      - 400 if can't create the new User
+      - 400 if can't create the new User (missing email or password, or
+        an attribute that is not a string)
     """
     rj = None
     error_msg = None
@@ -79,6 +277,12 @@ def create_user() -> str:
         error_msg = "email missing"
     if error_msg is None and rj.get("password", "") == "":
         error_msg = "password missing"
+    if error_msg is None:
+        for name in ("email", "password", "first_name", "last_name"):
+            value = rj.get(name)
+            if value is not None and type(value) is not str:
+                error_msg = "Wrong {}".format(name)
+                break
     if error_msg is None:
         try:
             user = User()
@@ -93,6 +297,95 @@ def create_user() -> str:
     return jsonify({'error': error_msg}), 400
 
 
+@app_views.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def create_users() -> str:
+    """ POST /api/v1/users/bulk
+    JSON body:
+      - list of users, each with email, password and optional
+        last_name and first_name
+    Return:
+      - created: list of User objects JSON represented
+      - errors: list of {index, error} for the users not created (missing
+        email or password, or an attribute that is not a string)
+      - 201 if at least one User has been created, 400 otherwise
+    """
+    rj = None
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not list:
+        return jsonify({'error': "Wrong format"}), 400
+    users = []
+    errors = []
+    for i, item in enumerate(rj):
+        error_msg = None
+        if type(item) is not dict:
+            error_msg = "Wrong format"
+        if error_msg is None and item.get("email", "") == "":
+            error_msg = "email missing"
+        if error_msg is None and item.get("password", "") == "":
+            error_msg = "password missing"
+        if error_msg is None:
+            for name in ("email", "password", "first_name", "last_name"):
+                value = item.get(name)
+                if value is not None and type(value) is not str:
+                    error_msg = "Wrong {}".format(name)
+                    break
+        if error_msg is None:
+            try:
+                user = User()
+                user.email = item.get("email")
+                user.password = item.get("password")
+                user.first_name = item.get("first_name")
+                user.last_name = item.get("last_name")
+                users.append(user)
+            except Exception as e:
+                error_msg = "Can't create User: {}".format(e)
+        if error_msg is not None:
+            errors.append({'index': i, 'error': error_msg})
+    if len(users) > 0:
+        try:
+            User.save_many(users)
+        except Exception as e:
+            return jsonify({'error': "Can't create Users: {}".format(e)}), 400
+    created = [user.to_json() for user in users]
+    return jsonify({'created': created, 'errors': errors}), \
+        201 if len(created) > 0 else 400
+
+
+@app_views.route('/users/batch_get', methods=['POST'], strict_slashes=False)
+def view_many_users() -> str:
+    """ POST /api/v1/users/batch_get
+    JSON body:
+      - ids: list of User IDs, at most USERS_BATCH_MAX (100)
+    Query parameter (optional):
+      - fields: comma separated attributes to return (all by default)
+    Return:
+      - users: list of the User objects found JSON represented
+      - missing: list of the IDs not found
+      - 400 if the body or fields is not valid
+    """
+    try:
+        serialize = user_serializer()
+    except ValueError:
+        return jsonify({'error': "Wrong fields"}), 400
+    rj = None
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not dict or type(rj.get("ids")) is not list:
+        return jsonify({'error': "Wrong format"}), 400
+    ids = rj.get("ids")
+    if any(type(obj_id) is not str for obj_id in ids):
+        return jsonify({'error': "Wrong format"}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX:
+        return jsonify({'error': "Too many ids"}), 400
+    return batch_response(ids, serialize)
+
+
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
 def update_user(user_id: str = None) -> str:
     """ PUT /api/v1/users/:id
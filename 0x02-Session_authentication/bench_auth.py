@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Benchmark of the compiled excluded-path matcher of Auth.require_auth
+against a loop over the excluded paths
+Usage: ./bench_auth.py [count ...]   (default: 4 100 1000 excluded paths)
+"""
+import sys
+import time
+from api.v1.auth.auth import Auth
+from api.v1.auth.path_matcher import PathMatcher
+
+counts = [int(arg) for arg in sys.argv[1:]] or [4, 100, 1000]
+requests = 100000
+
+
+def loop_require_auth(path: str, excluded_paths: list) -> bool:
+    """ Previous implementation: normalize and compare every entry
+    """
+    if path is None or excluded_paths is None or len(excluded_paths) == 0:
+        return True
+    normalized_path = path.rstrip('/')
+    for excluded_path in excluded_paths:
+        normalized_excluded_path = excluded_path.rstrip('/')
+        if normalized_path == normalized_excluded_path:
+            return False
+        if normalized_excluded_path.endswith('*'):
+            if normalized_path.startswith(normalized_excluded_path[:-1]):
+                return False
+    return True
+
+
+def measure(label: str, count: int, require_auth):
+    """ Print the time per request taken by `require_auth`
+    """
+    start = time.perf_counter()
+    for i in range(requests):
+        require_auth(paths[i % len(paths)])
+    elapsed = time.perf_counter() - start
+    print("{:>6} excluded paths {:>8}: {:.2f}us/request".format(
+        count, label, elapsed / requests * 1e6))
+
+
+auth = Auth()
+for count in counts:
+    excluded = ['/api/v1/status/', '/api/v1/unauthorized/',
+                '/api/v1/forbidden/', '/api/v1/auth_session/login/']
+    excluded += ['/api/v1/public{}/*'.format(i)
+                 for i in range(count - len(excluded))]
+    excluded = excluded[:count]
+    paths = ['/api/v1/users', '/api/v1/users/me', '/api/v1/status',
+             '/api/v1/forbidden/', '/api/v1/public{}/x'.format(count // 2)]
+    matcher = PathMatcher(excluded)
+    for path in paths:
+        assert auth.require_auth(path, matcher) == \
+            loop_require_auth(path, excluded)
+    measure("loop", count, lambda p: loop_require_auth(p, excluded))
+    measure("compiled", count, lambda p: auth.require_auth(p, matcher))
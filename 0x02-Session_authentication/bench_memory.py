@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Benchmark of the memory used per stored User
+Usage: ./bench_memory.py [count]   (default: 1000000)
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from models.user import User
+
+
+class DictUser():
+    """ User fields kept in a per-instance __dict__, as before __slots__
+    """
+
+    def __init__(self, **kwargs):
+        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+for klass in (DictUser, User):
+    tracemalloc.start()
+    objs = {}
+    for i in range(count):
+        obj = klass(email="user{}@hbtn.io".format(i), first_name="Bob",
+                    last_name="Dylan", _password="0" * 64)
+        objs[obj.id] = obj
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("{:>8} {:>8}: {:.0f} bytes per user".format(
+        count, klass.__name__, size / count))
+    del objs
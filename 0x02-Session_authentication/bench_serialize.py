@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+""" Benchmark of the generated User conversions against the generic path
+Usage: ./bench_serialize.py [count ...]   (default: 100000)
+"""
+import sys
+import time
+from models.user import User
+
+counts = [int(arg) for arg in sys.argv[1:]] or [100000]
+
+
+def measure(label: str, count: int, convert):
+    """ Print the time taken to convert every user with `convert`
+    """
+    start = time.perf_counter()
+    for user in users:
+        convert(user)
+    elapsed = time.perf_counter() - start
+    print("{:>8} users {:>20}: {:.2f}s".format(count, label, elapsed))
+
+
+for count in counts:
+    users = [User(email="user{}@hbtn.io".format(i), first_name="Bob",
+                  last_name="Dylan", _password="0" * 64)
+             for i in range(count)]
+    measure("generic to_json", count, lambda u: u.generic_json())
+    measure("generated to_json", count, lambda u: u.build_json())
+    measure("generic to_json(True)", count, lambda u: u.generic_json(True))
+    measure("generated to_json(True)", count, lambda u: u.build_json(True))
+    measure("generic record", count, lambda u: dict(u.fields(True)))
+    measure("generated record", count, lambda u: u.to_record())
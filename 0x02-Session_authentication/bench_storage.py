@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+""" Benchmark of User snapshot load/save time per storage format
+Usage: ./bench_storage.py [count ...]   (default: 100000 1000000)
+Run it from an empty directory: it writes .db_User.* files
+"""
+import sys
+import time
+from models.base import DATA
+from models.serializers import SERIALIZERS
+from models.user import User
+
+counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+
+for count in counts:
+    DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i), first_name="Bob",
+                    last_name="Dylan", _password="0" * 64)
+        DATA['User'][user.id] = user
+    for name in SERIALIZERS:
+        User.serializer = name
+        start = time.perf_counter()
+        User.save_to_file()
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        User.load_from_file()
+        load_time = time.perf_counter() - start
+        print("{:>8} users {:>6}: save {:.2f}s load {:.2f}s".format(
+            count, name, save_time, load_time))
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+""" Convert the User snapshot file between storage formats
+Usage: ./convert_db.py [target] [source]   (default: binary json)
+"""
+import sys
+from models.user import User
+
+target = sys.argv[1] if len(sys.argv) > 1 else "binary"
+source = sys.argv[2] if len(sys.argv) > 2 else "json"
+
+User.serializer = target
+User.convert_file(source)
+print("{} users: {} => {}".format(User.count(), User.file_path(source),
+                                  User.file_path()))
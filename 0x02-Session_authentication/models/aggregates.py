@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+""" Aggregates module
+"""
+from collections import Counter
+from typing import Callable, Iterable
+import heapq
+from models.codec import timestamp_key
+
+
+MISSING = object()
+
+
+def group_of(key: Callable, value):
+    """ Return the group `key(value)` (`value` itself without `key`), None
+    if the key function fails on it
+    """
+    if key is None:
+        return value
+    try:
+        return key(value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def top_groups(counts: dict, limit: int = None) -> dict:
+    """ Return the `limit` largest groups of a count per group (every
+    group without `limit`), ties by group
+    """
+    if limit is None or len(counts) <= limit:
+        return counts
+    try:
+        top = heapq.nsmallest(limit, counts.items(),
+                              key=lambda item: (-item[1], item[0]))
+    except TypeError:
+        top = heapq.nlargest(limit, counts.items(), key=lambda item: item[1])
+    return dict(top)
+
+
+class CountBy():
+    """ Incrementally maintained count of the objects of a model class
+    per group, the group of an object being `key(value of attribute)`
+    (objects whose group is None are not counted), `key` receiving the
+    text of the values of a `timestamp` attribute
+    Maintained like a secondary index, on every save, remove and load.
+    With the `index` of the same attribute, updated after the count, the
+    previous group of an object is found from the value it indexes;
+    without, the group of every object is kept
+    """
+
+    def __init__(self, attribute: str, key: Callable = None, index=None,
+                 timestamp: bool = False):
+        """ Initialize an empty count grouping on `attribute`
+        """
+        self.attribute = attribute
+        self.key = key
+        self.index = index
+        self.timestamp = timestamp
+        self.unique = False
+        self.clear()
+
+    def clear(self):
+        """ Drop every count
+        """
+        self._groups = {} if self.index is None else None
+        self._counts = {}
+
+    def check(self, obj_id: str, value):
+        """ A count never rejects a value
+        """
+        return
+
+    def group(self, value):
+        """ Return the group of `value`, None if it has none
+        """
+        if self.timestamp:
+            value = timestamp_key(value)
+        return group_of(self.key, value)
+
+    def group_by_id(self, obj_id: str):
+        """ Return the group `obj_id` is counted in, None if it is not
+        """
+        if self._groups is not None:
+            return self._groups.get(obj_id)
+        value = self.index.value_of(obj_id, MISSING)
+        if value is MISSING:
+            return None
+        return self.group(value)
+
+    def add(self, obj_id: str, value):
+        """ Count `obj_id` in the group of `value`, instead of its previous
+        group
+        """
+        self._move(obj_id, self.group_by_id(obj_id), self.group(value))
+
+    def _move(self, obj_id: str, previous, group):
+        """ Count `obj_id` in `group` instead of `previous`
+        """
+        if previous == group:
+            return
+        if previous is not None:
+            self._uncount(previous)
+        if self._groups is not None:
+            self._groups.pop(obj_id, None)
+        if group is None:
+            return
+        try:
+            self._counts[group] = self._counts.get(group, 0) + 1
+        except TypeError:
+            return
+        if self._groups is not None:
+            self._groups[obj_id] = group
+
+    def _uncount(self, group):
+        """ Remove one object from the count of `group`
+        """
+        try:
+            count = self._counts.get(group, 0) - 1
+        except TypeError:
+            return
+        if count <= 0:
+            self._counts.pop(group, None)
+        else:
+            self._counts[group] = count
+
+    def add_many(self, entries: Iterable[tuple]):
+        """ Count many (obj_id, value) entries
+        An empty count (a load) is built in one pass
+        """
+        if len(self._counts) > 0:
+            moved = {}
+            for obj_id, value in entries:
+                previous = moved.get(obj_id, MISSING)
+                if previous is MISSING:
+                    previous = self.group_by_id(obj_id)
+                group = self.group(value)
+                self._move(obj_id, previous, group)
+                moved[obj_id] = group
+            return
+        groups = {}
+        for obj_id, value in entries:
+            group = self.group(value)
+            if group is not None:
+                groups[obj_id] = group
+        try:
+            counts = dict(Counter(groups.values()))
+        except TypeError:
+            counts = {}
+            for obj_id, group in list(groups.items()):
+                try:
+                    counts[group] = counts.get(group, 0) + 1
+                except TypeError:
+                    del groups[obj_id]
+        if self._groups is not None:
+            self._groups = groups
+        self._counts = counts
+
+    def discard(self, obj_id: str):
+        """ Stop counting `obj_id`
+        """
+        previous = self.group_by_id(obj_id)
+        if previous is not None:
+            self._uncount(previous)
+        if self._groups is not None:
+            self._groups.pop(obj_id, None)
+
+    def counts(self, limit: int = None) -> dict:
+        """ Return a copy of the count per group, of the `limit` largest
+        groups only with `limit`
+        """
+        return top_groups(dict(self._counts), limit)
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+""" Storage backends module
+"""
+from typing import Callable, TypeVar, List, Iterable, Iterator
+import os
+import threading
+import uuid
+from models.aggregates import CountBy
+from models.codec import timestamp_key
+from models.flusher import WriteBehindFlusher
+from models.index import NGRAM_SIZE, HashIndex, NgramIndex, SortedIndex
+from models.journal import Journal
+from models.query import SUBSTRING_OPERATORS, Query, casefold, finish
+from models.serializers import write_records
+from models.stores import DiskStore, LazyStore, peek, peek_many, records
+
+
+DATA = {}
+INDEXES = {}
+SORTED_INDEXES = {}
+NGRAM_INDEXES = {}
+NGRAM_BUILDS = {}
+JOURNALS = {}
+FLUSHERS = {}
+SNAPSHOTS = {}
+SHARDS = {}
+VERSIONS = {}
+AGGREGATES = {}
+INSTANCE_TOKEN = uuid.uuid4().hex
+
+
+class Backend():
+    """ Storage backend interface: every method receives the model class
+    (or an instance of it) it works for
+    """
+
+    def load(self, cls, serializer: str = None):
+        """ Make the stored objects of `cls` available
+        """
+        raise NotImplementedError()
+
+    def save_to_file(self, cls, fsync: bool = False):
+        """ Persist every object of `cls`
+        """
+        raise NotImplementedError()
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store `obj`
+        """
+        raise NotImplementedError()
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove `obj`
+        """
+        raise NotImplementedError()
+
+    def save_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Store every object of `objs`
+        """
+        for obj in objs:
+            self.save(obj)
+
+    def remove_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Remove every object of `objs`
+        """
+        for obj in objs:
+            self.remove(obj)
+
+    def count(self, cls) -> int:
+        """ Count all objects of `cls`
+        """
+        raise NotImplementedError()
+
+    def all(self, cls) -> Iterable[TypeVar('Base')]:
+        """ Return all objects of `cls`
+        """
+        return self.search(cls)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object of `cls` by ID
+        """
+        raise NotImplementedError()
+
+    def get_many(self, cls, ids: Iterable[str]) -> List[TypeVar('Base')]:
+        """ Return the objects of `cls` found among `ids`, in their order
+        """
+        objs = (self.get(cls, obj_id) for obj_id in ids)
+        return [obj for obj in objs if obj is not None]
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects of `cls` with matching attributes
+        """
+        raise NotImplementedError()
+
+    def version(self, cls) -> str:
+        """ Return a token changing with every mutation of the objects of
+        `cls`, None if the backend cannot tell
+        """
+        return None
+
+    def aggregate(self, cls, name: str, limit: int = None) -> dict:
+        """ Return the count per group of the aggregate `name` of `cls`
+        (of its `limit` largest groups with `limit`), computed by scanning
+        every object
+        """
+        attribute, key = cls.aggregates[name]
+        count = CountBy(attribute, key,
+                        timestamp=attribute in cls.timestamps)
+        for obj in self.all(cls):
+            count.add(obj.id, getattr(obj, attribute, None))
+        return count.counts(limit)
+
+    def reset_aggregate(self, cls, name: str):
+        """ Take a new or changed declaration of the aggregate `name` of
+        `cls` into account
+        """
+        return
+
+    def plan(self, query: Query) -> tuple:
+        """ Return (description, candidate ids, ordered) for `query`
+        """
+        return ("scan", None, False)
+
+    def execute(self, query: Query) -> Iterator[TypeVar('Base')]:
+        """ Run `query` by scanning every object
+        """
+        objs = (obj for obj in self.all(query.cls) if query.matches(obj))
+        return finish(query, objs, False)
+
+
+class MemoryBackend(Backend):
+    """ Objects kept in the process (DATA), persisted to snapshot files,
+    an optional journal or an out-of-core data file
+    Writers mutate DATA and the indexes under a short publication lock
+    and invalidate the id snapshot of the class; readers scan immutable
+    snapshots without locking. Disk writes are serialized by a separate
+    lock, so they never block readers
+    """
+
+    def __init__(self):
+        """ Initialize the backend locks
+        """
+        self._publish_lock = threading.Lock()
+        self._persist_lock = threading.RLock()
+
+    def publish(self, cls):
+        """ Invalidate the snapshot of `cls` after a mutation, must be
+        called with the publication lock held
+        """
+        s_class = cls.__name__
+        VERSIONS[s_class] = VERSIONS.get(s_class, 0) + 1
+        SNAPSHOTS[s_class] = None
+
+    def snapshot(self, cls) -> tuple:
+        """ Return an immutable tuple of the ids of `cls`, rebuilt by the
+        first reader after a mutation
+        """
+        s_class = cls.__name__
+        snapshot = SNAPSHOTS.get(s_class)
+        if snapshot is not None:
+            return snapshot
+        version = VERSIONS.get(s_class, 0)
+        snapshot = tuple(DATA[s_class])
+        with self._publish_lock:
+            if VERSIONS.get(s_class, 0) == version:
+                SNAPSHOTS[s_class] = snapshot
+        return snapshot
+
+    def version(self, cls) -> str:
+        """ Return the mutation counter of `cls`, prefixed by a token of
+        this backend so that it never repeats across restarts
+        """
+        return "{}.{}".format(INSTANCE_TOKEN, VERSIONS.get(cls.__name__, 0))
+
+    @staticmethod
+    def key_of(cls, attribute: str) -> Callable:
+        """ Return the key function of the indexes on `attribute`: the
+        text of the timestamps, so that loads can index them as stored
+        """
+        if attribute in cls.timestamps:
+            return timestamp_key
+        return None
+
+    def indexes(self, cls) -> dict:
+        """ Return the secondary indexes of the class by attribute
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            indexes = {}
+            for attribute in cls.indexed_attributes:
+                indexes[attribute] = HashIndex(attribute,
+                                               key=self.key_of(cls, attribute))
+            for attribute in cls.unique_attributes:
+                indexes[attribute] = HashIndex(attribute, unique=True,
+                                               key=self.key_of(cls, attribute))
+            INDEXES[s_class] = indexes
+        return INDEXES[s_class]
+
+    def sorted_indexes(self, cls) -> dict:
+        """ Return the sorted indexes of the class by attribute
+        """
+        s_class = cls.__name__
+        if SORTED_INDEXES.get(s_class) is None:
+            indexes = {}
+            for attribute in cls.sorted_attributes:
+                if attribute in cls.casefold_attributes:
+                    key = casefold
+                else:
+                    key = self.key_of(cls, attribute)
+                indexes[attribute] = SortedIndex(attribute, key=key)
+            SORTED_INDEXES[s_class] = indexes
+        return SORTED_INDEXES[s_class]
+
+    def ngram_indexes(self, cls) -> dict:
+        """ Return the n-gram indexes of the class built so far, by
+        attribute
+        """
+        s_class = cls.__name__
+        if NGRAM_INDEXES.get(s_class) is None:
+            NGRAM_INDEXES[s_class] = {}
+        return NGRAM_INDEXES[s_class]
+
+    def ngram_index(self, cls, attribute: str) -> NgramIndex:
+        """ Return the n-gram index of `attribute`, None if it is not
+        declared in `ngram_attributes` or not built yet (substring queries
+        scan the objects until then)
+        """
+        if attribute not in cls.ngram_attributes:
+            return None
+        return self.ngram_indexes(cls).get(attribute)
+
+    def build_ngram_indexes(self, cls, store):
+        """ Build the n-gram indexes of `cls` from `store`, run on a
+        background thread by load()
+        The ids are read under the publication lock but the indexes are
+        built without it, so writers never wait for a build: the ids they
+        write meanwhile are recorded in NGRAM_BUILDS, then indexed again
+        under the lock before the indexes are published. A build gives up
+        if the class is loaded again
+        """
+        s_class = cls.__name__
+        written = {}
+        with self._publish_lock:
+            if DATA.get(s_class) is not store:
+                return
+            NGRAM_BUILDS[s_class] = written
+            ids = list(store)
+        indexes = {}
+        for attribute in cls.ngram_attributes:
+            index = NgramIndex(attribute)
+            index.add_many(peek_many(store, ids, attribute))
+            indexes[attribute] = index
+        with self._publish_lock:
+            if NGRAM_BUILDS.get(s_class) is written:
+                del NGRAM_BUILDS[s_class]
+            if DATA.get(s_class) is not store:
+                return
+            for index in indexes.values():
+                for obj_id in written:
+                    index.discard(obj_id)
+                index.add_many(peek_many(store, list(written),
+                                         index.attribute))
+            NGRAM_INDEXES[s_class] = indexes
+
+    def count_by(self, cls, attribute: str, key: Callable) -> CountBy:
+        """ Return an empty count of `cls` per `key(attribute)`, finding
+        the previous groups of the objects from an index on `attribute`
+        if there is one, rather than keeping them
+        """
+        index = self.indexes(cls).get(attribute)
+        if index is None and attribute not in cls.casefold_attributes:
+            index = self.sorted_indexes(cls).get(attribute)
+        return CountBy(attribute, key, index=index,
+                       timestamp=attribute in cls.timestamps)
+
+    def aggregates(self, cls) -> dict:
+        """ Return the aggregates of the class by name, maintained with
+        the indexes
+        """
+        s_class = cls.__name__
+        if AGGREGATES.get(s_class) is None:
+            aggregates = {}
+            for name, (attribute, key) in cls.aggregates.items():
+                aggregates[name] = self.count_by(cls, attribute, key)
+            AGGREGATES[s_class] = aggregates
+        return AGGREGATES[s_class]
+
+    def all_indexes(self, cls) -> list:
+        """ Return every index of the class, aggregates first: they read
+        the previous values of the objects from the other indexes
+        """
+        return list(self.aggregates(cls).values()) + \
+            list(self.indexes(cls).values()) + \
+            list(self.sorted_indexes(cls).values()) + \
+            list(self.ngram_indexes(cls).values())
+
+    def aggregate(self, cls, name: str, limit: int = None) -> dict:
+        """ Return the count per group of the aggregate `name` of `cls`
+        (of its `limit` largest groups with `limit`), without scanning
+        the objects
+        """
+        return self.aggregates(cls)[name].counts(limit)
+
+    def reset_aggregate(self, cls, name: str):
+        """ Rebuild the aggregate `name` of `cls` from the stored objects
+        after its declaration changed
+        """
+        s_class = cls.__name__
+        with self._publish_lock:
+            aggregates = self.aggregates(cls)
+            aggregates.pop(name, None)
+            if name not in cls.aggregates:
+                return
+            attribute, key = cls.aggregates[name]
+            count = self.count_by(cls, attribute, key)
+            store = DATA.get(s_class, {})
+            raw = attribute in cls.timestamps
+            count.add_many((obj_id, peek(store, obj_id, attribute, raw))
+                           for obj_id in list(store))
+            aggregates[name] = count
+
+    def rebuild_indexes(self, cls):
+        """ Rebuild all secondary indexes from the stored objects
+        Objects of a plain dictionary store are read directly, without
+        going through peek(); the timestamps of the other stores are
+        indexed as stored, without parsing them
+        """
+        s_class = cls.__name__
+        store = DATA.get(s_class, {})
+        for index in self.all_indexes(cls):
+            index.clear()
+            attribute = index.attribute
+            if type(store) is dict:
+                index.add_many((obj_id, getattr(obj, attribute, None))
+                               for obj_id, obj in store.items())
+            else:
+                raw = attribute in cls.timestamps
+                index.add_many((obj_id, peek(store, obj_id, attribute, raw))
+                               for obj_id in list(store))
+
+    def shard_members(self, cls) -> list:
+        """ Return, for each shard of the class, the ids it holds
+        """
+        s_class = cls.__name__
+        members = SHARDS.get(s_class)
+        if members is None or len(members) != cls.shards:
+            members = [{} for _ in range(cls.shards)]
+            for obj_id in list(DATA.get(s_class, {})):
+                members[cls.shard_of(obj_id)][obj_id] = None
+            SHARDS[s_class] = members
+        return members
+
+    def get_journal(self, cls) -> Journal:
+        """ Return the append-only journal of the class
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(".db_{}.journal".format(s_class))
+        return JOURNALS[s_class]
+
+    def get_flusher(self, cls) -> WriteBehindFlusher:
+        """ Return the write-behind flusher of the class
+        """
+        s_class = cls.__name__
+        if FLUSHERS.get(s_class) is None:
+            FLUSHERS[s_class] = WriteBehindFlusher(
+                cls.save_to_file, interval=cls.write_behind_interval,
+                batch_size=cls.write_behind_batch_size,
+                durability=cls.write_behind_durability)
+        return FLUSHERS[s_class]
+
+    def load(self, cls, serializer: str = None):
+        """ Load all objects from file
+        The snapshot is read first, then the journal is replayed over it
+        Out of core, the data file is opened instead and the snapshot is
+        only imported into it when it is empty
+        """
+        s_class = cls.__name__
+        if isinstance(DATA.get(s_class), DiskStore):
+            DATA[s_class].close()
+        if cls.out_of_core:
+            store = DiskStore(cls, cls.data_path(), cls.cache_size,
+                              cls.timestamps)
+        elif cls.lazy:
+            store = LazyStore(cls, cls.timestamps)
+        else:
+            store = {}
+        if isinstance(store, LazyStore):
+            put = store.add_raw
+        else:
+            def put(obj_json):
+                obj = cls(**obj_json)
+                store[obj.id] = obj
+        journal = self.get_journal(cls)
+        if len(store) == 0:
+            for obj_json in cls.read_file(serializer):
+                put(obj_json)
+            for op, obj_id, obj_json in journal.replay():
+                if op == "save":
+                    put(obj_json)
+                elif op == "remove":
+                    store.pop(obj_id, None)
+        with self._publish_lock:
+            DATA[s_class] = store
+            SHARDS[s_class] = None
+            NGRAM_INDEXES[s_class] = None
+            NGRAM_BUILDS.pop(s_class, None)
+            self.rebuild_indexes(cls)
+            self.publish(cls)
+        if len(cls.ngram_attributes) > 0:
+            threading.Thread(target=self.build_ngram_indexes,
+                             args=(cls, store), daemon=True).start()
+        sharding = cls.shards > 0 and not cls.out_of_core and \
+            not cls.has_shard_files()
+        if journal.records > 0 or sharding:
+            self.save_to_file(cls)
+        if sharding and os.path.exists(cls.file_path()):
+            os.replace(cls.file_path(), cls.file_path() + ".split")
+
+    def save_to_file(self, cls, fsync: bool = False):
+        """ Save all objects to a new snapshot file (or to every shard
+        file) and drop the journal records it now contains
+        Out of core, the data file is compacted instead
+        """
+        s_class = cls.__name__
+        with self._persist_lock:
+            if isinstance(DATA[s_class], DiskStore):
+                DATA[s_class].compact(fsync)
+                return
+            if cls.shards > 0:
+                for shard in range(cls.shards):
+                    self.save_shard(cls, shard, fsync)
+            else:
+                write_records(cls.file_path(), cls.serializer,
+                              records(DATA[s_class]), fsync)
+            journal = self.get_journal(cls)
+            if journal.records > 0:
+                journal.truncate()
+
+    def save_shard(self, cls, shard: int, fsync: bool = False):
+        """ Rewrite the file of one shard, with its ids taken under the
+        persistence lock so that the last write has the latest ids
+        """
+        with self._persist_lock:
+            with self._publish_lock:
+                ids = list(self.shard_members(cls)[shard])
+            write_records(cls.file_path(shard=shard), cls.serializer,
+                          records(DATA[cls.__name__], ids), fsync)
+
+    def persist(self, cls, op: str, objs: List[TypeVar('Base')]):
+        """ Persist the mutation of `objs`: deferred to the flusher in
+        write-behind mode, journal records in journal mode, a rewrite of
+        the shards of `objs` when sharded, a full snapshot rewrite
+        otherwise
+        Out of core, the store already appended the mutations to its file
+        """
+        if isinstance(DATA[cls.__name__], DiskStore):
+            return
+        if cls.write_behind:
+            self.get_flusher(cls).mark_dirty()
+            return
+        if not cls.journal:
+            if cls.shards > 0:
+                shards = {cls.shard_of(obj.id) for obj in objs}
+                for shard in sorted(shards):
+                    self.save_shard(cls, shard)
+            else:
+                self.save_to_file(cls)
+            return
+        with self._persist_lock:
+            journal = self.get_journal(cls)
+            for obj in objs:
+                if op == "save":
+                    journal.append(op, obj.id, obj.to_json(True))
+                else:
+                    journal.append(op, obj.id)
+            if journal.records >= cls.journal_compact_every:
+                self.save_to_file(cls)
+
+    def check_unique(self, cls, objs: List[TypeVar('Base')]):
+        """ Raise a ValueError if storing `objs` would break a unique index,
+        against stored objects or inside the batch
+        """
+        for index in self.indexes(cls).values():
+            if not index.unique:
+                continue
+            seen = {}
+            for obj in objs:
+                value = getattr(obj, index.attribute, None)
+                index.check(obj.id, value)
+                if value is None:
+                    continue
+                try:
+                    other_id = seen.setdefault(value, obj.id)
+                except TypeError:
+                    continue
+                if other_id != obj.id:
+                    raise ValueError("{} {} already exists".format(
+                        index.attribute, value))
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store `obj` and update the indexes
+        """
+        self.save_many(obj.__class__, [obj])
+
+    def save_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Store every object of `objs`, update the indexes and persist
+        them at once
+        """
+        objs = list(objs)
+        if len(objs) == 0:
+            return
+        store = DATA[cls.__name__]
+        with self._publish_lock:
+            indexes = self.all_indexes(cls)
+            self.check_unique(cls, objs)
+            for index in indexes:
+                index.add_many((obj.id, getattr(obj, index.attribute, None))
+                               for obj in objs)
+            written = NGRAM_BUILDS.get(cls.__name__)
+            for obj in objs:
+                store[obj.id] = obj
+                if written is not None:
+                    written[obj.id] = None
+                if cls.shards > 0:
+                    members = self.shard_members(cls)
+                    members[cls.shard_of(obj.id)][obj.id] = None
+            self.publish(cls)
+        self.persist(cls, "save", objs)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove `obj` and its index entries
+        """
+        self.remove_many(obj.__class__, [obj])
+
+    def remove_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Remove every object of `objs` and persist them at once
+        """
+        store = DATA[cls.__name__]
+        removed = []
+        with self._publish_lock:
+            written = NGRAM_BUILDS.get(cls.__name__)
+            for obj in objs:
+                if obj.id not in store:
+                    continue
+                del store[obj.id]
+                for index in self.all_indexes(cls):
+                    index.discard(obj.id)
+                if written is not None:
+                    written[obj.id] = None
+                if cls.shards > 0:
+                    members = self.shard_members(cls)
+                    members[cls.shard_of(obj.id)].pop(obj.id, None)
+                removed.append(obj)
+            if len(removed) > 0:
+                self.publish(cls)
+        if len(removed) > 0:
+            self.persist(cls, "remove", removed)
+
+    def count(self, cls) -> int:
+        """ Count all objects
+        """
+        return len(DATA[cls.__name__])
+
+    def all(self, cls) -> Iterable[TypeVar('Base')]:
+        """ Return all objects
+        Out of core, objects are streamed from the data file
+        """
+        s_class = cls.__name__
+        if isinstance(DATA[s_class], DiskStore):
+            return DATA[s_class].stream()
+        return self.search(cls)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        return DATA[cls.__name__].get(id)
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        Equality on an indexed attribute only scans its index bucket, and
+        objects of a lazy store are only built when they match
+        Objects removed while the search runs are skipped
+        """
+        s_class = cls.__name__
+        store = DATA[s_class]
+        def _search(obj_id):
+            try:
+                for k, v in attributes.items():
+                    if (peek(store, obj_id, k) != v):
+                        return False
+            except KeyError:
+                return False
+            return True
+
+        candidates = None
+        indexes = self.indexes(cls)
+        for k, v in attributes.items():
+            if indexes.get(k) is not None:
+                candidates = indexes[k].lookup(v)
+                break
+        if candidates is None:
+            candidates = self.snapshot(cls)
+        result = []
+        for obj_id in filter(_search, candidates):
+            obj = store.get(obj_id)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def plan(self, query: Query) -> tuple:
+        """ Return (description, candidate ids, ordered) for `query`:
+        equality on a hash index first, then a range, prefix or equality
+        on a sorted index, then a substring on an n-gram index, then an
+        ordered scan of the sorted index of the ordering attribute, started
+        at the position of the query if any, else a scan of every object
+        The sorted index of a casefold attribute is ordered ignoring case:
+        it only answers prefixes and equalities, by candidates
+        """
+        cls = query.cls
+        hashes = self.indexes(cls)
+        sorteds = self.sorted_indexes(cls)
+        for predicate in query.predicates:
+            index = hashes.get(predicate.attribute)
+            if predicate.op == '==' and index is not None:
+                return ("hash index on {}".format(predicate.attribute),
+                        index.lookup(predicate.value), query.order is None)
+        for predicate in query.predicates:
+            index = sorteds.get(predicate.attribute)
+            if index is None or predicate.value is None:
+                continue
+            ordered = query.order in (None, predicate.attribute)
+            reverse = query.descending and query.order is not None
+            value = predicate.value
+            folded = predicate.attribute in cls.casefold_attributes
+            if predicate.op in ('startswith', 'istartswith'):
+                if type(value) is not str or \
+                        (predicate.op == 'istartswith' and not folded):
+                    continue
+                ids = index.prefix(value, reverse)
+            elif predicate.op == '==':
+                ids = index.range(value, value, reverse=reverse)
+            elif folded:
+                continue
+            elif predicate.op in ('>', '>='):
+                ids = index.range(low=value,
+                                  low_inclusive=predicate.op == '>=',
+                                  reverse=reverse)
+            elif predicate.op in ('<', '<='):
+                ids = index.range(high=value,
+                                  high_inclusive=predicate.op == '<=',
+                                  reverse=reverse)
+            else:
+                continue
+            return ("sorted index {} on {}".format(predicate.op,
+                                                   predicate.attribute),
+                    ids, ordered)
+        for predicate in query.predicates:
+            if predicate.op not in SUBSTRING_OPERATORS or \
+                    type(predicate.value) is not str or \
+                    len(predicate.value.casefold()) < NGRAM_SIZE:
+                continue
+            index = self.ngram_index(cls, predicate.attribute)
+            if index is None:
+                continue
+            ids = index.candidates(predicate.value)
+            if ids is not None:
+                return ("n-gram index on {}".format(predicate.attribute),
+                        ids, query.order is None)
+        if query.order in sorteds and query.position is not None:
+            (value_key, value), obj_id = query.position
+            return ("sorted index seek on {}".format(query.order),
+                    sorteds[query.order].after(value, obj_id,
+                                               query.descending), True)
+        if query.order in sorteds:
+            return ("sorted index scan on {}".format(query.order),
+                    sorteds[query.order].scan(query.descending), True)
+        return ("scan", self.snapshot(cls), query.order is None)
+
+    def execute(self, query: Query) -> Iterator[TypeVar('Base')]:
+        """ Run `query` lazily following its plan
+        """
+        store = DATA[query.cls.__name__]
+        description, ids, ordered = self.plan(query)
+        predicates = query.predicates
+
+        def _matches(obj_id):
+            try:
+                for predicate in predicates:
+                    value = peek(store, obj_id, predicate.attribute)
+                    if not predicate.test(value):
+                        return False
+            except KeyError:
+                return False
+            return True
+
+        objs = (obj for obj in map(store.get, filter(_matches, ids))
+                if obj is not None)
+        return finish(query, objs, ordered)
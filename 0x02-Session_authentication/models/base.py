@@ -1,21 +1,84 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from functools import lru_cache
+from typing import Callable, TypeVar, List, Iterable, Iterator, Tuple
+from os import getenv
+import base64
+import glob
+import hashlib
 import json
+import os
+import threading
 import uuid
+import zlib
+from models.backends import DATA, Backend, MemoryBackend
+from models.codec import ClassCodec, encode_timestamp
+from models.query import Query
+from models.serializers import PRECISE_TIMESTAMP_FORMAT, \
+    TIMESTAMP_FORMAT, get_serializer, read_records
+from models.sqlite_backend import SQLiteBackend
 
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+BACKENDS = {}
+JSON_CACHES = {}
+JSON_CACHES_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def compile_projection(names: Tuple[str]) -> Callable:
+    """ Return a function converting an object to a JSON dictionary of
+    the attributes `names` only, built once per distinct set of names
+    """
+    def project(obj) -> dict:
+        result = {}
+        for name in names:
+            try:
+                value = getattr(obj, name)
+            except AttributeError:
+                continue
+            result[name] = encode_timestamp(value)
+        return result
+    return project
 
 
 class Base():
     """ Base class
+    Subclasses declaring `__slots__` store their fields without a
+    per-instance __dict__
+    The public JSON representation of an object read on its own
+    (encoded_json()) is cached until one of its attributes is set, for
+    the `json_cache_size` objects of the class read most recently
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at', '_json_cache')
+    transient_attributes = ('_json_cache',)
+    indexed_attributes = ()
+    unique_attributes = ()
+    sorted_attributes = ()
+    casefold_attributes = ()
+    ngram_attributes = ()
+    aggregates = {}
+    journal = False
+    journal_compact_every = 1000
+    write_behind = False
+    write_behind_interval = 1.0
+    write_behind_batch_size = 100
+    write_behind_durability = 'interval'
+    serializer = 'json'
+    shards = 0
+    shard_pool = 'thread'
+    lazy = False
+    out_of_core = False
+    cache_size = 1024
+    json_cache_size = 1024
+    timestamps = ('created_at', 'updated_at')
+    backend = getenv('DB_BACKEND', 'memory')
+    sqlite_path = getenv('DB_SQLITE_PATH', '.db.sqlite3')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -24,16 +87,32 @@ class Base():
             DATA[s_class] = {}
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.updated_at = datetime.utcnow()
+        self.created_at = self.parse_timestamp(kwargs.get('created_at'))
+        self.updated_at = self.parse_timestamp(kwargs.get('updated_at'))
+
+    @staticmethod
+    def parse_timestamp(value) -> datetime:
+        """ Return a datetime from a stored timestamp (string, with or
+        without microseconds, or datetime), or the current time if there
+        is none
+        Strings in the stored format are read by fromisoformat(), many
+        times faster than strptime(), kept for the other ones
+        """
+        if value is None:
+            return datetime.utcnow()
+        if type(value) is datetime:
+            return value
+        if len(value) in (19, 26) and value[4] == value[7] == '-' and \
+                value[10] == 'T':
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                parsed = None
+            if parsed is not None and parsed.tzinfo is None:
+                return parsed
+        if len(value) > 19 and value[19] == '.':
+            return datetime.strptime(value, PRECISE_TIMESTAMP_FORMAT)
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,94 +123,448 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def slot_names(cls) -> tuple:
+        """ Return the names of the slots declared along the class
+        hierarchy, base class first
+        """
+        names = cls.__dict__.get('_slot_names')
+        if names is None:
+            names = []
+            for klass in reversed(cls.__mro__):
+                slots = klass.__dict__.get('__slots__', ())
+                if type(slots) is str:
+                    slots = (slots,)
+                for name in slots:
+                    if name not in ('__dict__', '__weakref__') and \
+                            name not in cls.transient_attributes and \
+                            name not in names:
+                        names.append(name)
+            names = tuple(names)
+            cls._slot_names = names
+        return names
+
+    @classmethod
+    def codec(cls) -> ClassCodec:
+        """ Return the conversions generated for the class from its
+        declared fields, None if its objects have a __dict__ (fields not
+        known in advance)
+        """
+        if '_class_codec' not in cls.__dict__:
+            codec = None
+            if cls.__dictoffset__ == 0:
+                codec = ClassCodec(cls)
+            cls._class_codec = codec
+        return cls._class_codec
+
+    def fields(self, for_serialization: bool = False) -> Iterator[Tuple]:
+        """ Yield (name, value) for every stored attribute
+        """
+        for key in self.slot_names():
+            if not for_serialization and key[0] == '_':
+                continue
+            try:
+                yield key, getattr(self, key)
+            except AttributeError:
+                continue
+        for key, value in getattr(self, '__dict__', {}).items():
+            if not for_serialization and key[0] == '_':
+                continue
+            yield key, value
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, dropping the cached JSON representation
+        """
+        object.__setattr__(self, name, value)
+        if name != '_json_cache':
+            object.__setattr__(self, '_json_cache', None)
+
+    def json_cache(self) -> dict:
+        """ Return the JSON cache of the object, emptied by any attribute
+        set, and mark the object as the most recently cached of its class:
+        the caches of the least recently cached objects beyond
+        `json_cache_size` are dropped
+        """
+        cache = getattr(self, '_json_cache', None)
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, '_json_cache', cache)
+        with JSON_CACHES_LOCK:
+            cached = JSON_CACHES.setdefault(self.__class__.__name__,
+                                            OrderedDict())
+            other = cached.get(self.id)
+            if other is not None and other is not self:
+                object.__setattr__(other, '_json_cache', None)
+            cached[self.id] = self
+            cached.move_to_end(self.id)
+            while len(cached) > self.json_cache_size:
+                obj_id, obj = cached.popitem(last=False)
+                object.__setattr__(obj, '_json_cache', None)
+        return cache
+
+    def encoded_json(self, dumps: Callable, **kwargs: dict) -> str:
+        """ Return the public JSON representation encoded by
+        `dumps(obj, **kwargs)`, cached until an attribute is set
+        Meant for reads of one object: lists encode to_json() instead, so
+        that they leave nothing behind
+        """
+        cache = self.json_cache()
+        options = tuple(sorted(kwargs.items()))
+        encoded = cache.get('encoded')
+        if encoded is None or encoded[0] != dumps or encoded[1] != options:
+            result = cache.get('json')
+            if result is None:
+                result = self.build_json(False)
+                cache['json'] = result
+            encoded = (dumps, options, dumps(result, **kwargs))
+            cache['encoded'] = encoded
+        return encoded[2]
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
+        The public representation is copied from the cache filled by
+        encoded_json() if there is one, it is never cached here
+        """
+        if not for_serialization:
+            cache = getattr(self, '_json_cache', None)
+            if cache is not None and 'json' in cache:
+                return dict(cache['json'])
+            return self.build_json(False)
+        return self.build_json(True)
+
+    def build_json(self, for_serialization: bool = False) -> dict:
+        """ Build the JSON dictionary of the object, with the generated
+        conversion of the class if it has one
+        """
+        codec = self.codec()
+        if codec is not None:
+            try:
+                if for_serialization:
+                    return codec.full_json(self)
+                return codec.public_json(self)
+            except AttributeError:
+                pass
+        return self.generic_json(for_serialization)
+
+    def generic_json(self, for_serialization: bool = False) -> dict:
+        """ Build the JSON dictionary of the object from its fields()
         """
         result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
+        for key, value in self.fields(for_serialization):
             if type(value) is datetime:
                 result[key] = value.strftime(TIMESTAMP_FORMAT)
             else:
                 result[key] = value
         return result
 
+    def to_record(self) -> dict:
+        """ Return the stored attributes of the object, private ones
+        included and timestamps as datetimes
+        """
+        codec = self.codec()
+        if codec is not None:
+            try:
+                return codec.record(self)
+            except AttributeError:
+                pass
+        return dict(self.fields(True))
+
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def public_fields(cls) -> tuple:
+        """ Return the names of the public stored fields of the class, the
+        only attributes a projection may read
+        """
+        return tuple(name for name in cls.slot_names() if name[0] != '_')
+
+    @classmethod
+    def projection(cls, names: Iterable[str]) -> Callable:
+        """ Return a function converting an object to a JSON dictionary of
+        the public stored fields `names` only, like to_json()
+        Raise a ValueError for an empty projection or a name that is not
+        a public stored field (private field, property, method or class
+        attribute)
+        """
+        names = tuple(sorted(set(names)))
+        if len(names) == 0:
+            raise ValueError("no attribute to project")
+        public = cls.public_fields()
+        for name in names:
+            if name not in public:
+                raise ValueError("{} is not a public field".format(name))
+        return compile_projection(names)
+
+    @classmethod
+    def file_path(cls, serializer: str = None, shard: int = None) -> str:
+        """ Return the snapshot file path of the class, or of one of its
+        shards
+        """
+        serializer = get_serializer(serializer or cls.serializer)
+        if shard is None:
+            return ".db_{}.{}".format(cls.__name__, serializer.extension)
+        return ".db_{}.{}-of-{}.{}".format(cls.__name__, shard, cls.shards,
+                                           serializer.extension)
+
+    @classmethod
+    def shard_of(cls, obj_id: str) -> int:
+        """ Return the shard holding the object `obj_id`
+        """
+        return zlib.crc32(obj_id.encode('utf-8')) % cls.shards
+
+    @classmethod
+    def shard_counts(cls, serializer: str = None) -> set:
+        """ Return the numbers of shards of the shard files of the class
+        found on disk
+        """
+        extension = get_serializer(serializer or cls.serializer).extension
+        prefix = ".db_{}.".format(cls.__name__)
+        counts = set()
+        for file in glob.glob("{}*-of-*.{}".format(glob.escape(prefix),
+                                                   extension)):
+            shard = file[len(prefix):-len(extension) - 1].split('-of-')
+            if len(shard) == 2 and shard[0].isdigit() and \
+                    shard[1].isdigit():
+                counts.add(int(shard[1]))
+        return counts
+
+    @classmethod
+    def has_shard_files(cls, serializer: str = None) -> bool:
+        """ Whether shard files of the class exist
+        Raise a ValueError if they were written for another number of
+        shards: reading the single snapshot instead would lose objects
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        counts = cls.shard_counts(serializer)
+        if len(counts) == 0:
+            return False
+        if counts != {cls.shards}:
+            raise ValueError("{} has shard files for {} shards, not {}".format(
+                cls.__name__, ", ".join(map(str, sorted(counts))),
+                cls.shards))
+        return True
+
+    @classmethod
+    def data_path(cls) -> str:
+        """ Return the path of the out-of-core data file of the class
+        """
+        return ".db_{}.dat".format(cls.__name__)
+
+    @classmethod
+    def read_file(cls, serializer: str = None) -> Iterator[dict]:
+        """ Yield the stored attributes of every object of the snapshot
+        Shard files, when there are any, are read in parallel by a pool
+        of threads or processes (`shard_pool`), a missing one being empty
+        """
+        name = serializer or cls.serializer
+        if not cls.has_shard_files(name):
+            yield from read_records(cls.file_path(name), name)
             return
+        paths = [cls.file_path(name, shard) for shard in range(cls.shards)]
+        if cls.shard_pool == 'process':
+            executor = ProcessPoolExecutor
+        else:
+            executor = ThreadPoolExecutor
+        workers = min(cls.shards, os.cpu_count() or 1)
+        with executor(max_workers=workers) as pool:
+            for shard_records in pool.map(read_records, paths,
+                                          [name] * cls.shards):
+                yield from shard_records
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def get_backend(cls) -> Backend:
+        """ Return the storage backend of the class
+        """
+        if cls.backend == 'memory':
+            key = cls.backend
+        elif cls.backend == 'sqlite':
+            key = (cls.backend, cls.sqlite_path)
+        else:
+            raise ValueError("unknown backend {}".format(cls.backend))
+        if BACKENDS.get(key) is None:
+            if cls.backend == 'memory':
+                BACKENDS[key] = MemoryBackend()
+            else:
+                BACKENDS[key] = SQLiteBackend(cls.sqlite_path)
+        return BACKENDS[key]
 
     @classmethod
-    def save_to_file(cls):
+    def load_from_file(cls, serializer: str = None):
+        """ Load all objects from file
+        """
+        cls.get_backend().load(cls, serializer)
+
+    @classmethod
+    def save_to_file(cls, fsync: bool = False):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls.get_backend().save_to_file(cls, fsync)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def convert_file(cls, source: str = 'json'):
+        """ Rewrite the `source` snapshot of the class with the class
+        serializer
+        """
+        cls.load_from_file(source)
+        cls.save_to_file()
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__.get_backend().save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__.get_backend().remove(self)
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Save many objects, persisting them at once
+        """
+        objs = list(objs)
+        now = datetime.utcnow()
+        for obj in objs:
+            obj.updated_at = now
+        cls.get_backend().save_many(cls, objs)
+
+    @classmethod
+    def remove_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Remove many objects, persisting them at once
+        """
+        cls.get_backend().remove_many(cls, list(objs))
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls.get_backend().count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all objects
         """
-        return cls.search()
+        return cls.get_backend().all(cls)
 
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls.get_backend().get(cls, id)
+
+    @classmethod
+    def get_many(cls, ids: Iterable[str]) -> List[TypeVar('Base')]:
+        """ Return the objects found among `ids`, in their order
+        """
+        return cls.get_backend().get_many(cls, ids)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls.get_backend().search(cls, attributes)
+
+    def etag(self, variant: str = "") -> str:
+        """ Return the strong ETag of the `variant` representation of the
+        object, derived from its id and updated_at without serializing it
+        """
+        key = "{}\0{}\0{}".format(self.id, self.updated_at, variant)
+        return hashlib.blake2b(key.encode('utf-8'),
+                               digest_size=16).hexdigest()
+
+    @classmethod
+    def register_aggregate(cls, name: str, attribute: str,
+                           key: Callable = None):
+        """ Declare the aggregate `name` counting the objects of the class
+        per `key(value of attribute)` (per value without `key`), kept up
+        to date on every save, remove and load
+        The key of a timestamp attribute receives its text (isoformat())
+        """
+        cls.aggregates = dict(cls.aggregates, **{name: (attribute, key)})
+        cls.get_backend().reset_aggregate(cls, name)
+
+    @classmethod
+    def aggregate(cls, name: str, limit: int = None) -> dict:
+        """ Return the count per group of the aggregate `name`, of its
+        `limit` largest groups only with `limit`
+        """
+        return cls.get_backend().aggregate(cls, name, limit)
+
+    @classmethod
+    def version(cls) -> str:
+        """ Return a token changing with every save or remove of an object
+        of the class, None if the backend cannot tell
+        """
+        return cls.get_backend().version(cls)
+
+    @classmethod
+    def collection_etag(cls, variant: str = "") -> str:
+        """ Return the strong ETag of the `variant` representation of a
+        list of objects of the class, derived from the class version, None
+        if the backend has no version
+        """
+        version = cls.version()
+        if version is None:
+            return None
+        key = "{}\0{}\0{}".format(cls.__name__, version, variant)
+        return hashlib.blake2b(key.encode('utf-8'),
+                               digest_size=16).hexdigest()
+
+    @classmethod
+    def query(cls) -> Query:
+        """ Return a lazy query on all objects, refined with filter(),
+        where(), order_by(), limit() and offset()
+        """
+        return Query(cls)
+
+    @classmethod
+    def encode_cursor(cls, obj: TypeVar('Base'), attribute: str) -> str:
+        """ Return the opaque cursor of the position of `obj` in the
+        `attribute` order
+        """
+        value = getattr(obj, attribute)
+        if type(value) is datetime:
+            value = value.isoformat()
+        data = json.dumps([value, obj.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    @classmethod
+    def decode_cursor(cls, cursor: str, attribute: str) -> tuple:
+        """ Return the (value, id) position of an opaque cursor, raise a
+        ValueError if it is not valid (a timestamp with a time zone
+        included: stored ones are naive)
+        """
+        try:
+            value, obj_id = json.loads(base64.urlsafe_b64decode(
+                cursor.encode('ascii')).decode('utf-8'))
+        except Exception:
+            raise ValueError("invalid cursor")
+        if type(obj_id) is not str:
+            raise ValueError("invalid cursor")
+        if attribute in cls.timestamps and value is not None:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError("invalid cursor")
+            if value.tzinfo is not None:
+                raise ValueError("invalid cursor")
+        return value, obj_id
+
+    @classmethod
+    def page(cls, limit: int, cursor: str = None,
+             attribute: str = 'created_at') -> Tuple[List[TypeVar('Base')],
+                                                     str]:
+        """ Return one page of at most `limit` objects in (`attribute`, id)
+        order, starting after `cursor`, and the cursor of the next page
+        (None on the last page)
+        With a sorted index on `attribute`, a page costs its size, not the
+        number of objects
+        """
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        query = cls.query().order_by(attribute)
+        if cursor is not None:
+            query = query.after(*cls.decode_cursor(cursor, attribute))
+        objs = query.limit(limit + 1).all()
+        if len(objs) <= limit:
+            return objs, None
+        objs = objs[:limit]
+        return objs, cls.encode_cursor(objs[-1], attribute)
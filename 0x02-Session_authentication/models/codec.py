@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+""" Per-class codec module
+"""
+from datetime import datetime
+from typing import Callable, Iterable
+from models.serializers import TIMESTAMP_FORMAT
+
+
+isoformat = datetime.isoformat
+
+
+def encode_timestamp(value):
+    """ Return the stored string of a timestamp, the value itself if it
+    is not a datetime
+    isoformat() is twice as fast as strftime() and gives the same text
+    for naive datetimes from year 1000
+    """
+    if type(value) is not datetime:
+        return value
+    if value.tzinfo is None and value.year >= 1000:
+        return isoformat(value, 'T', 'seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def timestamp_key(value):
+    """ Return the text of a timestamp, ordered like its datetime: the
+    isoformat() of a datetime, a stored string (or any other value) as is
+    Indexes on timestamps are keyed by it, so loads index the stored
+    strings without parsing them
+    """
+    if type(value) is datetime:
+        return isoformat(value)
+    return value
+
+
+class ClassCodec():
+    """ Conversions of the objects of one model class to dictionaries,
+    generated once from the fields it declares in `__slots__`: fixed
+    keys in declaration order, private fields known in advance and a
+    direct encoder for the `timestamps` fields only
+    """
+
+    def __init__(self, cls):
+        """ Generate the conversions of `cls`
+        """
+        self.fields = tuple(cls.slot_names())
+        self.private = frozenset(name for name in self.fields
+                                 if name[0] == '_')
+        self.public = tuple(name for name in self.fields
+                            if name not in self.private)
+        self.timestamps = frozenset(cls.timestamps) & frozenset(self.fields)
+        self.public_json = self.compile('public_json', self.public, True)
+        self.full_json = self.compile('full_json', self.fields, True)
+        self.record = self.compile('record', self.fields, False)
+
+    def compile(self, name: str, fields: Iterable[str],
+                encode: bool) -> Callable:
+        """ Return a function building the dictionary of `fields` of an
+        object, encoding its timestamps if `encode`
+        Raise an AttributeError for an object with an unset field
+        """
+        items = []
+        for field in fields:
+            value = "obj.{}".format(field)
+            if encode and field in self.timestamps:
+                value = "encode_timestamp({})".format(value)
+            items.append("{!r}: {}".format(field, value))
+        source = "def {}(obj):\n    return {{{}}}\n".format(
+            name, ", ".join(items))
+        namespace = {'encode_timestamp': encode_timestamp}
+        exec(compile(source, "<codec {}>".format(name), 'exec'), namespace)
+        return namespace[name]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Write-behind flusher module
+"""
+from typing import Callable
+import atexit
+import logging
+import threading
+
+
+DURABILITY_POLICIES = ('none', 'interval', 'fsync')
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindFlusher():
+    """ Coalesce the mutations of one model class into batched flushes
+    done by a background thread
+    Durability policies:
+      - none: flush when `batch_size` mutations are pending and on shutdown
+      - interval: also flush every `interval` seconds when dirty
+      - fsync: like interval, and fsync the file after each flush
+    A failed flush is logged and its mutations stay pending for the next
+    one
+    """
+
+    def __init__(self, flush: Callable[[bool], None], interval: float = 1.0,
+                 batch_size: int = 100, durability: str = 'interval'):
+        """ Initialize a flusher calling `flush(fsync)` to persist
+        """
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError("unknown durability policy {}".format(durability))
+        self.interval = interval
+        self.batch_size = batch_size
+        self.durability = durability
+        self._flush = flush
+        self._pending = 0
+        self._stopped = False
+        self._thread = None
+        self._cond = threading.Condition()
+
+    def mark_dirty(self):
+        """ Record one pending mutation, waking the flusher if the batch
+        is full
+        """
+        with self._cond:
+            if self._stopped:
+                stopped = True
+            else:
+                stopped = False
+                self._pending += 1
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run,
+                                                    daemon=True)
+                    self._thread.start()
+                    atexit.register(self.stop)
+                if self._pending >= self.batch_size:
+                    self._cond.notify()
+        if stopped:
+            self._flush(self.durability == 'fsync')
+
+    def _run(self):
+        """ Flusher thread loop
+        """
+        timeout = None
+        if self.durability != 'none':
+            timeout = self.interval
+        while True:
+            with self._cond:
+                while not self._stopped and self._pending < self.batch_size:
+                    if not self._cond.wait(timeout) and self._pending > 0:
+                        break
+                stopped = self._stopped
+                pending = self._pending
+                self._pending = 0
+            if pending > 0:
+                try:
+                    self._flush(self.durability == 'fsync')
+                except Exception:
+                    logger.exception("write-behind flush of %d mutations "
+                                     "failed", pending)
+                    with self._cond:
+                        self._pending += pending
+            if stopped:
+                return
+
+    def stop(self):
+        """ Flush what is pending and stop the background thread
+        A last flush that failed in the thread is retried; if it fails
+        again, its exception is raised and the mutations stay pending for
+        another stop()
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._cond:
+            pending = self._pending
+            self._pending = 0
+        if pending > 0:
+            try:
+                self._flush(self.durability == 'fsync')
+            except Exception:
+                with self._cond:
+                    self._pending += pending
+                raise
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+""" Index module
+"""
+from typing import Callable, Iterable, Iterator, List
+import bisect
+
+
+MAX_CHAR = chr(0x10ffff)
+MAX_ID = MAX_CHAR
+CHUNK_SIZE = 256
+NGRAM_SIZE = 3
+
+
+def keyed(key: Callable, value):
+    """ Return the index key of `value`: `key(value)`, `value` itself
+    without `key` or for None
+    """
+    if key is None or value is None:
+        return value
+    return key(value)
+
+
+class HashIndex():
+    """ Secondary hash index on one attribute of a model class
+    Maps each attribute value (or `key(value)`) to the ids of the objects
+    holding it
+    """
+
+    def __init__(self, attribute: str, unique: bool = False,
+                 key: Callable = None):
+        """ Initialize an empty index on `attribute`
+        """
+        self.attribute = attribute
+        self.unique = unique
+        self.key = key
+        self._entries = {}
+        self._keys = {}
+        self._unhashable = {}
+
+    def clear(self):
+        """ Drop every entry of the index
+        """
+        self._entries = {}
+        self._keys = {}
+        self._unhashable = {}
+
+    def check(self, obj_id: str, value):
+        """ Raise a ValueError if `value` for `obj_id` would break a unique
+        index
+        """
+        if not self.unique or value is None:
+            return
+        value = keyed(self.key, value)
+        try:
+            bucket = self._entries.get(value)
+        except TypeError:
+            return
+        if bucket and any(other_id != obj_id for other_id in bucket):
+            raise ValueError("{} {} already exists".format(self.attribute,
+                                                          value))
+
+    def add(self, obj_id: str, value):
+        """ Index `value` for `obj_id`, replacing any previous entry
+        """
+        value = keyed(self.key, value)
+        if obj_id in self._keys:
+            if self._keys[obj_id] == value:
+                return
+            self.discard(obj_id)
+        elif obj_id in self._unhashable:
+            self.discard(obj_id)
+        try:
+            self._entries.setdefault(value, {})[obj_id] = None
+        except TypeError:
+            self._unhashable[obj_id] = value
+            return
+        self._keys[obj_id] = value
+
+    def add_many(self, entries: Iterable[tuple]):
+        """ Index many (obj_id, value) entries
+        """
+        for obj_id, value in entries:
+            self.add(obj_id, value)
+
+    def discard(self, obj_id: str):
+        """ Remove the entry of `obj_id` if present
+        """
+        if obj_id in self._unhashable:
+            del self._unhashable[obj_id]
+            return
+        if obj_id not in self._keys:
+            return
+        value = self._keys.pop(obj_id)
+        bucket = self._entries[value]
+        del bucket[obj_id]
+        if len(bucket) == 0:
+            del self._entries[value]
+
+    def value_of(self, obj_id: str, default=None):
+        """ Return the key indexed for `obj_id`, `default` if it is not
+        indexed
+        """
+        if obj_id in self._unhashable:
+            return self._unhashable[obj_id]
+        return self._keys.get(obj_id, default)
+
+    def lookup(self, value) -> List[str]:
+        """ Return the ids of the objects whose attribute may equal `value`
+        """
+        value = keyed(self.key, value)
+        try:
+            bucket = self._entries.get(value, {})
+        except TypeError:
+            bucket = {}
+        if len(self._unhashable) == 0:
+            return list(bucket)
+        return list(bucket) + list(self._unhashable)
+
+
+class SortedIndex():
+    """ Secondary sorted index on one attribute of a model class
+    Keeps (value, id) pairs sorted for range, prefix and ordered scans,
+    `key(value)` standing for the value (and for the bounds of the scans)
+    with a `key`.
+    Values that cannot be ordered (None, mixed types) are kept apart and
+    come first in ascending order, by id
+    """
+
+    def __init__(self, attribute: str, key: Callable = None):
+        """ Initialize an empty index on `attribute`
+        """
+        self.attribute = attribute
+        self.unique = False
+        self.key = key
+        self.clear()
+
+    def clear(self):
+        """ Drop every entry of the index
+        """
+        self._sorted = []
+        self._keys = {}
+        self._others = {}
+
+    def check(self, obj_id: str, value):
+        """ A sorted index never rejects a value
+        """
+        return
+
+    def add(self, obj_id: str, value):
+        """ Index `value` for `obj_id`, replacing any previous entry
+        """
+        self._add(obj_id, keyed(self.key, value))
+
+    def _add(self, obj_id: str, value):
+        """ Index the key `value` for `obj_id`
+        """
+        if obj_id in self._keys and self._keys[obj_id] == value:
+            return
+        self.discard(obj_id)
+        if value is None:
+            self._others[obj_id] = None
+            return
+        try:
+            bisect.insort(self._sorted, (value, obj_id))
+        except TypeError:
+            self._others[obj_id] = value
+            return
+        self._keys[obj_id] = value
+
+    def add_many(self, entries: Iterable[tuple]):
+        """ Index many (obj_id, value) entries
+        Large batches are appended and sorted once instead of inserted one
+        by one (each insertion moves the keys after it)
+        """
+        added = []
+        key = self.key
+        for obj_id, value in entries:
+            if key is not None and value is not None:
+                value = key(value)
+            if obj_id in self._keys and self._keys[obj_id] == value:
+                continue
+            self.discard(obj_id)
+            if value is None:
+                self._others[obj_id] = None
+            else:
+                added.append((value, obj_id))
+        if len(added) >= CHUNK_SIZE:
+            try:
+                merged = self._sorted + added
+                merged.sort()
+            except TypeError:
+                merged = None
+            if merged is not None:
+                self._sorted = merged
+                for value, obj_id in added:
+                    self._keys[obj_id] = value
+                return
+        for value, obj_id in added:
+            self._add(obj_id, value)
+
+    def discard(self, obj_id: str):
+        """ Remove the entry of `obj_id` if present
+        """
+        if obj_id in self._others:
+            del self._others[obj_id]
+            return
+        if obj_id not in self._keys:
+            return
+        key = (self._keys.pop(obj_id), obj_id)
+        position = bisect.bisect_left(self._sorted, key)
+        if position < len(self._sorted) and self._sorted[position] == key:
+            del self._sorted[position]
+
+    def __len__(self) -> int:
+        """ Number of indexed objects
+        """
+        return len(self._keys) + len(self._others)
+
+    def value_of(self, obj_id: str, default=None):
+        """ Return the key indexed for `obj_id`, `default` if it is not
+        indexed
+        """
+        if obj_id in self._others:
+            return self._others[obj_id]
+        return self._keys.get(obj_id, default)
+
+    def _bounds(self, low, high, low_inclusive: bool,
+                high_inclusive: bool) -> (int, int):
+        """ Return the slice of the sorted keys between two values
+        """
+        keys = self._sorted
+        start, end = 0, len(keys)
+        try:
+            if low is not None:
+                if low_inclusive:
+                    start = bisect.bisect_left(keys, (low,))
+                else:
+                    start = bisect.bisect_left(keys, (low, MAX_ID))
+            if high is not None:
+                if high_inclusive:
+                    end = bisect.bisect_left(keys, (high, MAX_ID))
+                else:
+                    end = bisect.bisect_left(keys, (high,))
+        except TypeError:
+            return 0, 0
+        return start, max(start, end)
+
+    def range(self, low=None, high=None, low_inclusive: bool = True,
+              high_inclusive: bool = True,
+              reverse: bool = False) -> Iterator[str]:
+        """ Yield in order the ids whose value is between `low` and `high`
+        (None for an open bound)
+        Keys are copied by chunks, so a scan stopped early (limit) only
+        pays for what it read
+        """
+        start, end = self._bounds(keyed(self.key, low),
+                                  keyed(self.key, high), low_inclusive,
+                                  high_inclusive)
+        return self._slice(start, end, reverse)
+
+    def _slice(self, start: int, end: int,
+               reverse: bool = False) -> Iterator[str]:
+        """ Yield in order the ids of the sorted keys between two positions
+        """
+        keys = self._sorted
+        if reverse:
+            for stop in range(end, start, -CHUNK_SIZE):
+                chunk = keys[max(start, stop - CHUNK_SIZE):stop]
+                for value, obj_id in reversed(chunk):
+                    yield obj_id
+        else:
+            for first in range(start, end, CHUNK_SIZE):
+                for value, obj_id in keys[first:min(end, first + CHUNK_SIZE)]:
+                    yield obj_id
+
+    def prefix(self, prefix: str, reverse: bool = False) -> Iterator[str]:
+        """ Yield in order the ids whose string value starts with `prefix`
+        Every string between `prefix` and `prefix` + MAX_CHAR starts with
+        it, so the range is read by chunks like range()
+        """
+        prefix = keyed(self.key, prefix)
+        start, end = self._bounds(prefix, prefix + MAX_CHAR, True, True)
+        return self._slice(start, end, reverse)
+
+    def scan(self, reverse: bool = False) -> Iterator[str]:
+        """ Yield every id in order
+        """
+        if not reverse:
+            yield from sorted(self._others)
+        yield from self.range(reverse=reverse)
+        if reverse:
+            yield from sorted(self._others, reverse=True)
+
+    def after(self, value, obj_id: str,
+              reverse: bool = False) -> Iterator[str]:
+        """ Yield in order the ids strictly after the entry (`value`,
+        `obj_id`), the position of a keyset pagination cursor
+        """
+        others = sorted(self._others, reverse=reverse)
+        if value is None:
+            if reverse:
+                yield from (other for other in others if other < obj_id)
+            else:
+                yield from (other for other in others if other > obj_id)
+                yield from self.range()
+            return
+        value = keyed(self.key, value)
+        try:
+            if reverse:
+                start, end = 0, bisect.bisect_left(self._sorted,
+                                                   (value, obj_id))
+            else:
+                start = bisect.bisect_right(self._sorted, (value, obj_id))
+                end = len(self._sorted)
+        except TypeError:
+            return
+        yield from self._slice(start, end, reverse)
+        if reverse:
+            yield from others
+
+
+class NgramIndex():
+    """ Secondary n-gram index on one string attribute of a model class
+    Maps every substring of NGRAM_SIZE characters of the casefolded values
+    to the ids holding it, to find the candidates of a substring search
+    """
+
+    def __init__(self, attribute: str, size: int = NGRAM_SIZE):
+        """ Initialize an empty index on `attribute`
+        """
+        self.attribute = attribute
+        self.size = size
+        self.unique = False
+        self.clear()
+
+    def clear(self):
+        """ Drop every entry of the index
+        """
+        self._postings = {}
+        self._keys = {}
+
+    def check(self, obj_id: str, value):
+        """ An n-gram index never rejects a value
+        """
+        return
+
+    def grams(self, value: str) -> set:
+        """ Return the n-grams of the casefolded `value`
+        """
+        folded = value.casefold()
+        return {folded[i:i + self.size]
+                for i in range(len(folded) - self.size + 1)}
+
+    def add(self, obj_id: str, value):
+        """ Index `value` for `obj_id`, replacing any previous entry
+        Only strings are indexed
+        """
+        if obj_id in self._keys and self._keys[obj_id] == value:
+            return
+        self.discard(obj_id)
+        if type(value) is not str:
+            return
+        self._keys[obj_id] = value
+        for gram in self.grams(value):
+            self._postings.setdefault(gram, {})[obj_id] = None
+
+    def add_many(self, entries: Iterable[tuple]):
+        """ Index many (obj_id, value) entries
+        """
+        for obj_id, value in entries:
+            self.add(obj_id, value)
+
+    def discard(self, obj_id: str):
+        """ Remove the entry of `obj_id` if present
+        """
+        if obj_id not in self._keys:
+            return
+        for gram in self.grams(self._keys.pop(obj_id)):
+            bucket = self._postings[gram]
+            del bucket[obj_id]
+            if len(bucket) == 0:
+                del self._postings[gram]
+
+    def __len__(self) -> int:
+        """ Number of indexed objects
+        """
+        return len(self._keys)
+
+    def candidates(self, text: str) -> Iterator[str]:
+        """ Return the ids whose value may contain `text`, ignoring case:
+        the ids holding all its n-grams, or None if `text` is too short
+        """
+        grams = self.grams(text)
+        if len(grams) == 0:
+            return None
+        buckets = sorted((self._postings.get(gram, {}) for gram in grams),
+                         key=len)
+        return self._intersect(buckets[0], buckets[1:])
+
+    def _intersect(self, first: dict, others: List[dict]) -> Iterator[str]:
+        """ Yield the ids of the posting `first` found in all `others`
+        The postings are read in place, so a search stopped early (limit)
+        only pays for what it read; if a writer changes `first` meanwhile,
+        the rest is read from a copy
+        """
+        found = set()
+        try:
+            for obj_id in first:
+                if all(obj_id in bucket for bucket in others):
+                    found.add(obj_id)
+                    yield obj_id
+            return
+        except RuntimeError:
+            pass
+        for obj_id in list(first):
+            if obj_id not in found and \
+                    all(obj_id in bucket for bucket in others):
+                yield obj_id
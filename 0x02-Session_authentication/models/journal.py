@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from typing import Iterator, Tuple
+from os import path
+from models.jsonlib import get_json
+
+
+class Journal():
+    """ Append-only log of the mutations of one model class
+    Each line is a compact JSON record:
+    {"op":"save"|"remove","id":...,"obj":...}
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a journal stored in `file_path`
+        """
+        self.file_path = file_path
+        self.records = 0
+        self._file = None
+
+    def append(self, op: str, obj_id: str, obj_json: dict = None):
+        """ Append one mutation record to the journal, encoded compact so
+        that orjson writes it when installed
+        """
+        record = {"op": op, "id": obj_id}
+        if obj_json is not None:
+            record["obj"] = obj_json
+        if self._file is None:
+            self._file = open(self.file_path, 'a')
+        self._file.write(get_json().dumps(record, compact=True) + "\n")
+        self._file.flush()
+        self.records += 1
+
+    def replay(self) -> Iterator[Tuple[str, str, dict]]:
+        """ Yield (op, id, obj_json) for every complete record on disk
+        A truncated last line (interrupted write) is ignored
+        """
+        self.records = 0
+        if not path.exists(self.file_path):
+            return
+        with open(self.file_path, 'r') as f:
+            for line in f:
+                try:
+                    record = get_json().loads(line)
+                except ValueError:
+                    break
+                self.records += 1
+                yield (record["op"], record["id"], record.get("obj"))
+
+    def truncate(self):
+        """ Drop every record, once they are part of a snapshot
+        """
+        self.close()
+        with open(self.file_path, 'w'):
+            pass
+        self.records = 0
+
+    def close(self):
+        """ Close the underlying file if open
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+""" JSON library module
+"""
+from os import getenv
+from typing import Callable
+import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+class StdlibJSON():
+    """ JSON encoding and decoding with the json module
+    """
+
+    name = 'stdlib'
+
+    def dumps(self, obj, default: Callable = None, sort_keys: bool = False,
+              compact: bool = False) -> str:
+        """ Encode `obj`, ASCII only, with `, ` and `: ` separators unless
+        `compact`
+        """
+        separators = COMPACT_SEPARATORS if compact else None
+        return json.dumps(obj, default=default, sort_keys=sort_keys,
+                          separators=separators)
+
+    def loads(self, data):
+        """ Decode a JSON document (str or bytes)
+        """
+        return json.loads(data)
+
+
+class OrJSON(StdlibJSON):
+    """ JSON encoding and decoding with orjson, giving the same text as
+    the json module
+    orjson only writes compact documents: other ones, documents it
+    cannot encode and the ones it would not escape like the json module
+    (non-ASCII text) are encoded by the json module. Floats are the
+    exception: with an exponent, orjson writes `1e16` instead of
+    `1e+16`, and it writes NaN and infinities as `null` where the json
+    module writes `NaN`, `Infinity` and `-Infinity` (which are not JSON)
+    """
+
+    name = 'orjson'
+
+    def dumps(self, obj, default: Callable = None, sort_keys: bool = False,
+              compact: bool = False) -> str:
+        """ Encode `obj`, ASCII only, with `, ` and `: ` separators unless
+        `compact`
+        """
+        if compact:
+            option = orjson.OPT_PASSTHROUGH_DATETIME
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                data = orjson.dumps(obj, default=default, option=option)
+            except orjson.JSONEncodeError:
+                data = None
+            if data is not None and data.isascii() and b'\x7f' not in data:
+                return data.decode('ascii')
+        return super().dumps(obj, default, sort_keys, compact)
+
+    def loads(self, data):
+        """ Decode a JSON document (str or bytes)
+        """
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return super().loads(data)
+
+
+JSON_LIBRARIES = {
+    StdlibJSON.name: StdlibJSON,
+    OrJSON.name: OrJSON,
+}
+_libraries = {}
+
+
+def get_json(name: str = None) -> StdlibJSON:
+    """ Return the JSON library `name`, by default the one of the
+    JSON_LIBRARY environment variable: `auto` (orjson when installed),
+    `orjson` or `stdlib`
+    """
+    name = name or getenv('JSON_LIBRARY', 'auto')
+    if name == 'auto':
+        name = OrJSON.name if orjson is not None else StdlibJSON.name
+    if name not in JSON_LIBRARIES:
+        raise ValueError("unknown JSON library {}".format(name))
+    if name == OrJSON.name and orjson is None:
+        raise ValueError("orjson is not installed")
+    if name not in _libraries:
+        _libraries[name] = JSON_LIBRARIES[name]()
+    return _libraries[name]
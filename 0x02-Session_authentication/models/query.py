@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+""" Query module
+"""
+from itertools import dropwhile, islice
+from typing import Iterator, List, TypeVar
+import operator
+
+
+def _startswith(value, prefix) -> bool:
+    """ Prefix predicate, only true for strings
+    """
+    return type(value) is str and value.startswith(prefix)
+
+
+def _istartswith(value, prefix) -> bool:
+    """ Case-insensitive prefix predicate, only true for strings
+    """
+    return type(value) is str and \
+        value.casefold().startswith(prefix.casefold())
+
+
+def _contains(value, values) -> bool:
+    """ Membership predicate
+    """
+    return value in values
+
+
+def _substring(value, text) -> bool:
+    """ Substring predicate, only true for strings
+    """
+    return type(value) is str and text in value
+
+
+def _isubstring(value, text) -> bool:
+    """ Case-insensitive substring predicate, only true for strings
+    """
+    return type(value) is str and text.casefold() in value.casefold()
+
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'startswith': _startswith,
+    'istartswith': _istartswith,
+    'in': _contains,
+    'contains': _substring,
+    'icontains': _isubstring,
+}
+SUBSTRING_OPERATORS = ('contains', 'icontains')
+RANGE_OPERATORS = ('<', '<=', '>', '>=')
+
+
+class Predicate():
+    """ One condition `attribute op value` of a query
+    """
+
+    def __init__(self, attribute: str, op: str, value):
+        """ Initialize a predicate
+        """
+        if op not in OPERATORS:
+            raise ValueError("unknown operator {}".format(op))
+        self.attribute = attribute
+        self.op = op
+        self.value = value
+        self._test = OPERATORS[op]
+
+    def test(self, value) -> bool:
+        """ Whether `value` satisfies the predicate
+        Ordering comparisons against None or another type are false
+        """
+        if value is None and self.op not in ('==', '!=', 'in'):
+            return False
+        try:
+            return self._test(value, self.value)
+        except TypeError:
+            return False
+
+    def __repr__(self) -> str:
+        """ Printable representation
+        """
+        return "{} {} {!r}".format(self.attribute, self.op, self.value)
+
+
+def casefold(value):
+    """ Return a string casefolded (the string itself if it does not
+    change), any other value as is
+    """
+    if type(value) is not str:
+        return value
+    folded = value.casefold()
+    return value if folded == value else folded
+
+
+def sort_key(value, fold: bool = False) -> tuple:
+    """ Ordering key placing None values first, ignoring case if `fold`
+    """
+    if fold:
+        value = casefold(value)
+    return (value is not None, value)
+
+
+def position_key(value, obj_id: str, fold: bool = False) -> tuple:
+    """ Total ordering key of an object: its ordering value, then its id
+    """
+    return (sort_key(value, fold), obj_id)
+
+
+class Query():
+    """ Lazy query on a model class: predicates, ordering and slicing are
+    recorded and only run, by the class backend, when iterated
+    """
+
+    def __init__(self, cls):
+        """ Initialize a query returning every object of `cls`
+        """
+        self.cls = cls
+        self.predicates = []
+        self.order = None
+        self.descending = False
+        self.fold = False
+        self.limit_count = None
+        self.offset_count = 0
+        self.position = None
+
+    def _copy(self) -> 'Query':
+        """ Return a copy of the query, queries are never mutated
+        """
+        query = Query(self.cls)
+        query.predicates = list(self.predicates)
+        query.order = self.order
+        query.descending = self.descending
+        query.fold = self.fold
+        query.limit_count = self.limit_count
+        query.offset_count = self.offset_count
+        query.position = self.position
+        return query
+
+    def filter(self, attribute: str, op: str, value) -> 'Query':
+        """ Keep objects whose `attribute` satisfies `op value`
+        (op: ==, !=, <, <=, >, >=, startswith, istartswith, in, contains
+        or icontains)
+        """
+        query = self._copy()
+        query.predicates.append(Predicate(attribute, op, value))
+        return query
+
+    def where(self, **attributes) -> 'Query':
+        """ Keep objects whose attributes equal the given values
+        """
+        query = self
+        for attribute, value in attributes.items():
+            query = query.filter(attribute, '==', value)
+        return query
+
+    def order_by(self, attribute: str, descending: bool = False) -> 'Query':
+        """ Order objects by `attribute`, None values first, ties by id,
+        ignoring case for the `casefold_attributes` of the class
+        """
+        query = self._copy()
+        query.order = attribute
+        query.descending = descending
+        query.fold = attribute in self.cls.casefold_attributes
+        return query
+
+    def after(self, value, obj_id: str) -> 'Query':
+        """ Keep objects strictly after the object `obj_id` whose ordering
+        attribute is `value` (keyset pagination), requires order_by()
+        """
+        if self.order is None:
+            raise ValueError("after() requires order_by()")
+        query = self._copy()
+        query.position = position_key(value, obj_id, self.fold)
+        return query
+
+    def is_after(self, obj: TypeVar('Base')) -> bool:
+        """ Whether `obj` comes after the position of the query
+        """
+        if self.position is None:
+            return True
+        key = position_key(getattr(obj, self.order), obj.id, self.fold)
+        if self.descending:
+            return key < self.position
+        return key > self.position
+
+    def limit(self, count: int) -> 'Query':
+        """ Return at most `count` objects
+        """
+        query = self._copy()
+        query.limit_count = count
+        return query
+
+    def offset(self, count: int) -> 'Query':
+        """ Skip the first `count` objects
+        """
+        query = self._copy()
+        query.offset_count = count
+        return query
+
+    def matches(self, obj: TypeVar('Base')) -> bool:
+        """ Whether `obj` satisfies every predicate
+        """
+        for predicate in self.predicates:
+            if not predicate.test(getattr(obj, predicate.attribute)):
+                return False
+        return True
+
+    def explain(self) -> str:
+        """ Describe how the backend will run the query
+        """
+        return self.cls.get_backend().plan(self)[0]
+
+    def __iter__(self) -> Iterator[TypeVar('Base')]:
+        """ Run the query, yielding objects as they are found
+        """
+        return self.cls.get_backend().execute(self)
+
+    def all(self) -> List[TypeVar('Base')]:
+        """ Run the query and return the list of objects
+        """
+        return list(self)
+
+    def first(self) -> TypeVar('Base'):
+        """ Run the query and return its first object or None
+        """
+        for obj in self.limit(1):
+            return obj
+        return None
+
+    def count(self) -> int:
+        """ Run the query and count the objects
+        """
+        return sum(1 for _ in self)
+
+
+def finish(query: Query, objs: Iterator[TypeVar('Base')],
+           ordered: bool) -> Iterator[TypeVar('Base')]:
+    """ Apply the ordering (unless `objs` already follow it), the position
+    and the offset/limit of `query` to the matching objects
+    Ordered objects before the position form a prefix, skipped unless the
+    backend already started from the position
+    """
+    if query.position is not None:
+        if ordered:
+            objs = dropwhile(lambda obj: not query.is_after(obj), objs)
+        else:
+            objs = filter(query.is_after, objs)
+    if query.order is not None and not ordered:
+        objs = iter(sorted(
+            objs, key=lambda obj: position_key(getattr(obj, query.order),
+                                               obj.id, query.fold),
+            reverse=query.descending))
+    stop = None
+    if query.limit_count is not None:
+        stop = query.offset_count + query.limit_count
+    return islice(objs, query.offset_count, stop)
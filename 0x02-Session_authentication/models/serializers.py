@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+""" Serializers module
+"""
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable, Iterator, List
+from os import path
+import calendar
+import json
+import os
+import struct
+from models.jsonlib import get_json
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+PRECISE_TIMESTAMP_FORMAT = TIMESTAMP_FORMAT + ".%f"
+EPOCH = datetime(1970, 1, 1)
+ABSENT = object()
+
+TAG_NONE = 0
+TAG_STR = 1
+TAG_INT = 2
+TAG_DATETIME = 3
+TAG_BOOL = 4
+TAG_FLOAT = 5
+TAG_ABSENT = 6
+TAG_JSON = 7
+TAG_DATETIME_US = 8
+
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+
+
+def encode_default(value) -> str:
+    """ JSON encoding of the values the json module does not handle
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+class JSONSerializer():
+    """ Serializer of a whole class as one JSON object keyed by id
+    """
+
+    name = 'json'
+    extension = 'json'
+    binary = False
+
+    def dump(self, records: Iterable[dict], f):
+        """ Write the stored attributes of every object to the file `f`
+        Encoded in one call: json.dump() would use the slow pure Python
+        encoder. The file keeps the `, ` separators of the json module,
+        which orjson cannot write: only reading it goes through orjson
+        """
+        objs_json = {}
+        for record in records:
+            objs_json[record['id']] = record
+        f.write(get_json().dumps(objs_json, default=encode_default))
+
+    def load(self, f) -> Iterator[dict]:
+        """ Yield the constructor keyword arguments of every stored object
+        """
+        return iter(get_json().loads(f.read()).values())
+
+
+class BinarySerializer():
+    """ Serializer of a whole class as length-prefixed binary records
+    File layout:
+      - magic `BDB1`, then the key table: u16 count, u16-prefixed keys
+      - one record per object: u32 payload length, then one tagged value
+        per key of the table
+    Timestamps are stored as integer epoch seconds, or microseconds when
+    they have a fraction of a second
+    """
+
+    name = 'binary'
+    extension = 'bin'
+    binary = True
+    magic = b'BDB1'
+
+    def encode_value(self, value) -> bytes:
+        """ Encode one tagged value
+        """
+        if value is None:
+            return b'\x00'
+        if type(value) is str:
+            data = value.encode('utf-8')
+            return b'\x01' + U32.pack(len(data)) + data
+        if type(value) is bool:
+            return b'\x04' + (b'\x01' if value else b'\x00')
+        if type(value) is int:
+            return b'\x02' + I64.pack(value)
+        if type(value) is datetime:
+            seconds = calendar.timegm(value.utctimetuple())
+            if value.microsecond == 0:
+                return b'\x03' + I64.pack(seconds)
+            return b'\x08' + I64.pack(seconds * 1000000 + value.microsecond)
+        if type(value) is float:
+            return b'\x05' + F64.pack(value)
+        data = json.dumps(value).encode('utf-8')
+        return b'\x07' + U32.pack(len(data)) + data
+
+    def encode_record(self, keys: list, values: dict) -> bytes:
+        """ Encode the values of one object following the key table
+        """
+        parts = []
+        for key in keys:
+            if key in values:
+                parts.append(self.encode_value(values[key]))
+            else:
+                parts.append(b'\x06')
+        payload = b''.join(parts)
+        return U32.pack(len(payload)) + payload
+
+    def decode_value(self, buf, offset: int) -> tuple:
+        """ Decode the tagged value at `offset` in `buf`, return the value
+        and the offset following it
+        """
+        tag = buf[offset]
+        offset += 1
+        if tag == TAG_STR:
+            size = U32.unpack_from(buf, offset)[0]
+            offset += 4
+            return str(buf[offset:offset + size], 'utf-8'), offset + size
+        if tag == TAG_NONE:
+            return None, offset
+        if tag == TAG_DATETIME:
+            seconds = I64.unpack_from(buf, offset)[0]
+            return EPOCH + timedelta(seconds=seconds), offset + 8
+        if tag == TAG_DATETIME_US:
+            microseconds = I64.unpack_from(buf, offset)[0]
+            return EPOCH + timedelta(microseconds=microseconds), offset + 8
+        if tag == TAG_INT:
+            return I64.unpack_from(buf, offset)[0], offset + 8
+        if tag == TAG_BOOL:
+            return buf[offset] == 1, offset + 1
+        if tag == TAG_FLOAT:
+            return F64.unpack_from(buf, offset)[0], offset + 8
+        if tag == TAG_JSON:
+            size = U32.unpack_from(buf, offset)[0]
+            offset += 4
+            data = str(buf[offset:offset + size], 'utf-8')
+            return json.loads(data), offset + size
+        if tag == TAG_ABSENT:
+            return ABSENT, offset
+        raise ValueError("unknown value tag {}".format(tag))
+
+    def decode_record(self, keys: list, buf, offset: int) -> dict:
+        """ Decode the record payload starting at `offset` in `buf`
+        """
+        values = {}
+        for key in keys:
+            value, offset = self.decode_value(buf, offset)
+            if value is not ABSENT:
+                values[key] = value
+        return values
+
+    def encode_fields(self, values: dict) -> bytes:
+        """ Encode a self-describing record: u16 field count, then a
+        u16-prefixed key and a tagged value per field
+        """
+        parts = [U16.pack(len(values))]
+        for key, value in values.items():
+            data = key.encode('utf-8')
+            parts.append(U16.pack(len(data)) + data)
+            parts.append(self.encode_value(value))
+        return b''.join(parts)
+
+    def decode_fields(self, buf, offset: int) -> dict:
+        """ Decode a record written by `encode_fields`
+        """
+        values = {}
+        count = U16.unpack_from(buf, offset)[0]
+        offset += 2
+        for _ in range(count):
+            size = U16.unpack_from(buf, offset)[0]
+            offset += 2
+            key = str(buf[offset:offset + size], 'utf-8')
+            values[key], offset = self.decode_value(buf, offset + size)
+        return values
+
+    def dump_header(self, keys: list) -> bytes:
+        """ Encode the file header for the key table `keys`
+        """
+        parts = [self.magic, U16.pack(len(keys))]
+        for key in keys:
+            data = key.encode('utf-8')
+            parts.append(U16.pack(len(data)) + data)
+        return b''.join(parts)
+
+    def load_header(self, buf) -> (list, int):
+        """ Decode the file header, return the key table and the offset
+        of the first record
+        """
+        if bytes(buf[:4]) != self.magic:
+            raise ValueError("not a {} file".format(self.name))
+        offset = 4
+        count = U16.unpack_from(buf, offset)[0]
+        offset += 2
+        keys = []
+        for _ in range(count):
+            size = U16.unpack_from(buf, offset)[0]
+            offset += 2
+            keys.append(str(buf[offset:offset + size], 'utf-8'))
+            offset += size
+        return keys, offset
+
+    def dump(self, records: Iterable[dict], f: BinaryIO):
+        """ Write the stored attributes of every object to the file `f`
+        """
+        records = list(records)
+        keys = []
+        for values in records:
+            for key in values:
+                if key not in keys:
+                    keys.append(key)
+        f.write(self.dump_header(keys))
+        for values in records:
+            f.write(self.encode_record(keys, values))
+
+    def load(self, f: BinaryIO) -> Iterator[dict]:
+        """ Yield the constructor keyword arguments of every stored object
+        """
+        buf = memoryview(f.read())
+        if len(buf) == 0:
+            return
+        keys, offset = self.load_header(buf)
+        end = len(buf)
+        while offset < end:
+            size = U32.unpack_from(buf, offset)[0]
+            offset += 4
+            yield self.decode_record(keys, buf, offset)
+            offset += size
+
+
+SERIALIZERS = {
+    JSONSerializer.name: JSONSerializer(),
+    BinarySerializer.name: BinarySerializer(),
+}
+
+
+def get_serializer(name: str):
+    """ Return the serializer registered as `name`
+    """
+    serializer = SERIALIZERS.get(name)
+    if serializer is None:
+        raise ValueError("unknown serializer {}".format(name))
+    return serializer
+
+
+def read_records(file_path: str, name: str) -> List[dict]:
+    """ Return the records of the snapshot file `file_path` written by the
+    serializer `name` (empty if there is no file)
+    Top-level so that process pools can run it
+    """
+    serializer = get_serializer(name)
+    if not path.exists(file_path):
+        return []
+    with open(file_path, 'rb' if serializer.binary else 'r') as f:
+        return list(serializer.load(f))
+
+
+def write_records(file_path: str, name: str, records: Iterable[dict],
+                  fsync: bool = False):
+    """ Atomically replace `file_path` with `records` written by the
+    serializer `name`
+    """
+    serializer = get_serializer(name)
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'wb' if serializer.binary else 'w') as f:
+        serializer.dump(records, f)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+""" SQLite storage backend module
+"""
+from datetime import datetime
+from typing import TypeVar, List, Iterable, Iterator
+import sqlite3
+import threading
+import uuid
+from models.aggregates import group_of
+from models.backends import Backend
+from models.index import MAX_CHAR
+from models.query import RANGE_OPERATORS, Query, finish
+from models.serializers import PRECISE_TIMESTAMP_FORMAT, TIMESTAMP_FORMAT
+
+
+BATCH_SIZE = 500
+
+
+def quote(name: str) -> str:
+    """ Quote an SQL identifier
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def literal(value: str) -> str:
+    """ Quote an SQL string literal
+    """
+    return "'{}'".format(value.replace("'", "''"))
+
+
+def casefold(value):
+    """ SQL function casefolding strings like str.casefold()
+    """
+    if type(value) is str:
+        return value.casefold()
+    return value
+
+
+def to_sql(value):
+    """ Convert an attribute value to its stored SQL value
+    Timestamps keep their microseconds (when not 0, so that the text
+    still sorts like the datetime): updated_at tells apart two saves in
+    the same second, as the ETag of an object requires
+    """
+    if type(value) is datetime:
+        if value.microsecond == 0:
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value.strftime(PRECISE_TIMESTAMP_FORMAT)
+    return value
+
+
+class SQLiteBackend(Backend):
+    """ Objects stored in one SQLite database shared by every process:
+    one table per class, one column per attribute, WAL journal mode and
+    an SQL index per declared indexed or sorted attribute
+    Triggers count the mutations of each table in the `_versions` table,
+    and the objects per group of each aggregate in the `_aggregates`
+    table (their key functions are SQL functions of every connection of
+    this backend)
+    """
+
+    def __init__(self, db_path: str):
+        """ Initialize a backend on the database file `db_path`
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._columns = {}
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """ Return the connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("casefold", 1, casefold, deterministic=True)
+            conn.create_function("aggregate_key", 3, self.aggregate_key,
+                                 deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def columns(self, cls, names: Iterable[str] = ()) -> List[str]:
+        """ Return the columns of the table of `cls`, creating the table,
+        its indexes and any column of `names` that does not exist yet
+        """
+        s_class = cls.__name__
+        columns = self._columns.get(s_class)
+        missing = [name for name in names
+                   if columns is None or name not in columns]
+        if columns is not None and len(missing) == 0:
+            return columns
+        with self._lock:
+            conn = self.connection()
+            table = quote(s_class)
+            conn.execute("CREATE TABLE IF NOT EXISTS {} "
+                         "(id TEXT PRIMARY KEY)".format(table))
+            columns = [row[1] for row in
+                       conn.execute("PRAGMA table_info({})".format(table))]
+            indexed = tuple(cls.indexed_attributes) + \
+                tuple(cls.sorted_attributes)
+            wanted = list(cls.slot_names()) + list(indexed) + \
+                list(cls.unique_attributes) + \
+                [attribute for attribute, key in cls.aggregates.values()] + \
+                list(names)
+            for name in wanted:
+                if name not in columns:
+                    try:
+                        conn.execute("ALTER TABLE {} ADD COLUMN {}".format(
+                            table, quote(name)))
+                    except sqlite3.OperationalError:
+                        pass
+                    columns.append(name)
+            for attribute in cls.indexed_attributes:
+                conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    quote("{}_{}".format(s_class, attribute)), table,
+                    quote(attribute)))
+            for attribute in cls.sorted_attributes:
+                if attribute in cls.casefold_attributes:
+                    name = "{}_{}_casefold_id".format(s_class, attribute)
+                else:
+                    name = "{}_{}_id".format(s_class, attribute)
+                conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({}, id)"
+                             .format(quote(name), table,
+                                     self.sort_column(cls, attribute)))
+            for attribute in cls.unique_attributes:
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})"
+                             .format(quote("{}_{}".format(s_class, attribute)),
+                                     table, quote(attribute)))
+            self.create_version(conn, s_class)
+            self._classes[s_class] = cls
+            for name in cls.aggregates:
+                self.create_aggregate(conn, cls, name)
+            self._columns[s_class] = columns
+        return columns
+
+    def create_version(self, conn: sqlite3.Connection, s_class: str):
+        """ Create the mutation counter of the table `s_class` and the
+        triggers incrementing it, with a random token so that a recreated
+        database never repeats a version
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS _versions (name TEXT "
+                     "PRIMARY KEY, token TEXT, version INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO _versions (name, token, version) "
+                     "VALUES (?, ?, 0)", (s_class, uuid.uuid4().hex))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute("CREATE TRIGGER IF NOT EXISTS {} AFTER {} ON {} "
+                         "BEGIN UPDATE _versions SET version = version + 1 "
+                         "WHERE name = {}; END".format(
+                             quote("{}_{}_version".format(s_class,
+                                                          event.lower())),
+                             event, quote(s_class), literal(s_class)))
+
+    def aggregate_key(self, s_class: str, name: str, value):
+        """ SQL function returning the group of a stored value for the
+        aggregate `name` of the class `s_class` (None if it has none or
+        the aggregate is unknown), timestamps being passed as stored, like
+        their text in the memory backend
+        """
+        cls = self._classes.get(s_class)
+        if cls is None or name not in cls.aggregates:
+            return None
+        attribute, key = cls.aggregates[name]
+        group = group_of(key, value)
+        if group is None or type(group) in (str, int, float):
+            return group
+        return str(group)
+
+    def create_aggregate(self, conn: sqlite3.Connection, cls, name: str,
+                         replace: bool = False):
+        """ Create the triggers maintaining the counts of the aggregate
+        `name` of `cls` and count the existing rows, unless they exist
+        (or to replace them after the declaration changed)
+        """
+        s_class = cls.__name__
+        table = quote(s_class)
+        triggers = ["{}_{}_aggregate_{}".format(s_class, name, event)
+                    for event in ('insert', 'update', 'delete')]
+        conn.execute("CREATE TABLE IF NOT EXISTS _aggregates (class TEXT, "
+                     "name TEXT, grp, count INTEGER NOT NULL, "
+                     "PRIMARY KEY (class, name, grp))")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND "
+                "name = ?", (triggers[0],)).fetchone() is not None
+            if exists and not replace:
+                conn.execute("COMMIT")
+                return
+            for trigger in triggers:
+                conn.execute("DROP TRIGGER IF EXISTS {}".format(
+                    quote(trigger)))
+            where = "class = {} AND name = {}".format(literal(s_class),
+                                                      literal(name))
+            conn.execute("DELETE FROM _aggregates WHERE {}".format(where))
+            if name not in cls.aggregates:
+                conn.execute("COMMIT")
+                return
+            column = quote(cls.aggregates[name][0])
+
+            def key(row: str) -> str:
+                """ SQL group of the NEW or OLD row """
+                return "aggregate_key({}, {}, {}.{})".format(
+                    literal(s_class), literal(name), row, column)
+
+            def add(row: str, delta: int) -> str:
+                """ SQL adding `delta` to the count of the group of a row,
+                computing the group once
+                """
+                sql = "INSERT INTO _aggregates SELECT {}, {}, k, {} FROM " \
+                      "(SELECT {} AS k) WHERE k IS NOT NULL ON CONFLICT " \
+                      "DO UPDATE SET count = count + {};".format(
+                          literal(s_class), literal(name), delta, key(row),
+                          delta)
+                if delta > 0:
+                    return sql
+                return "{} DELETE FROM _aggregates WHERE {} AND count <= 0;" \
+                    .format(sql, where)
+
+            conn.execute("INSERT INTO _aggregates SELECT {}, {}, k, COUNT(*) "
+                         "FROM (SELECT {} AS k FROM {}) WHERE k IS NOT NULL "
+                         "GROUP BY k".format(literal(s_class), literal(name),
+                                             key(table), table))
+            conn.execute("CREATE TRIGGER {} AFTER INSERT ON {} BEGIN {} END"
+                         .format(quote(triggers[0]), table, add("NEW", 1)))
+            conn.execute("CREATE TRIGGER {} AFTER UPDATE OF {} ON {} WHEN "
+                         "OLD.{} IS NOT NEW.{} BEGIN {} {} END".format(
+                             quote(triggers[1]), column, table, column,
+                             column, add("OLD", -1), add("NEW", 1)))
+            conn.execute("CREATE TRIGGER {} AFTER DELETE ON {} BEGIN {} END"
+                         .format(quote(triggers[2]), table, add("OLD", -1)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def aggregate(self, cls, name: str, limit: int = None) -> dict:
+        """ Return the count per group of the aggregate `name` of `cls`
+        (of its `limit` largest groups with `limit`), read from the counts
+        the triggers maintain
+        """
+        if name not in cls.aggregates:
+            raise KeyError(name)
+        self.columns(cls)
+        rows = self.connection().execute(
+            "SELECT grp, count FROM _aggregates WHERE class = ? AND "
+            "name = ? AND count > 0 ORDER BY count DESC, grp LIMIT ?",
+            (cls.__name__, name, -1 if limit is None else limit))
+        return {row[0]: row[1] for row in rows}
+
+    def reset_aggregate(self, cls, name: str):
+        """ Recreate the triggers and counts of the aggregate `name` of
+        `cls` after its declaration changed
+        """
+        names = [cls.aggregates[name][0]] if name in cls.aggregates else []
+        self.columns(cls, names)
+        with self._lock:
+            self.create_aggregate(self.connection(), cls, name, replace=True)
+
+    def version(self, cls) -> str:
+        """ Return the mutation counter of the table of `cls`, shared by
+        every process
+        """
+        self.columns(cls)
+        row = self.connection().execute(
+            "SELECT token, version FROM _versions WHERE name = ?",
+            (cls.__name__,)).fetchone()
+        return "{}.{}".format(row[0], row[1])
+
+    def build(self, cls, row: sqlite3.Row) -> TypeVar('Base'):
+        """ Build an object from a table row
+        """
+        return cls(**dict(row))
+
+    def upsert(self, cls, values_list: List[dict]):
+        """ Insert or update the rows of `values_list`
+        """
+        if len(values_list) == 0:
+            return
+        names = []
+        for values in values_list:
+            for name in values:
+                if name not in names:
+                    names.append(name)
+        self.columns(cls, names)
+        sql = "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT(id) DO UPDATE " \
+              "SET {}".format(
+                  quote(cls.__name__), ", ".join(map(quote, names)),
+                  ", ".join("?" * len(names)),
+                  ", ".join("{0} = excluded.{0}".format(quote(name))
+                            for name in names if name != "id"))
+        rows = [[to_sql(values.get(name)) for name in names]
+                for values in values_list]
+        conn = self.connection()
+        try:
+            conn.execute("BEGIN")
+            conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK")
+            raise ValueError(str(e))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self, cls, serializer: str = None):
+        """ Create the table of `cls`, importing the snapshot file into it
+        when it is empty
+        """
+        self.columns(cls)
+        if self.count(cls) > 0:
+            return
+        self.upsert(cls, list(cls.read_file(serializer)))
+
+    def save_to_file(self, cls, fsync: bool = False):
+        """ Every write is already committed: only checkpoint the WAL
+        when asked for durability
+        """
+        if fsync:
+            self.connection().execute("PRAGMA wal_checkpoint(FULL)")
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update the row of `obj`
+        """
+        self.upsert(obj.__class__, [obj.to_record()])
+
+    def save_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Insert or update the rows of `objs` in one transaction
+        """
+        self.upsert(cls, [obj.to_record() for obj in objs])
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of `obj`
+        """
+        self.remove_many(obj.__class__, [obj])
+
+    def remove_many(self, cls, objs: Iterable[TypeVar('Base')]):
+        """ Delete the rows of `objs` in one transaction
+        """
+        self.columns(cls)
+        conn = self.connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("DELETE FROM {} WHERE id = ?".format(
+                quote(cls.__name__)), [(obj.id,) for obj in objs])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def count(self, cls) -> int:
+        """ Count all rows
+        """
+        self.columns(cls)
+        return self.connection().execute("SELECT COUNT(*) FROM {}".format(
+            quote(cls.__name__))).fetchone()[0]
+
+    def all(self, cls) -> Iterable[TypeVar('Base')]:
+        """ Return all objects, built row by row as they are iterated
+        """
+        self.columns(cls)
+        rows = self.connection().execute("SELECT * FROM {} ORDER BY rowid"
+                                         .format(quote(cls.__name__)))
+        return (self.build(cls, row) for row in rows)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self.columns(cls)
+        row = self.connection().execute("SELECT * FROM {} WHERE id = ?".format(
+            quote(cls.__name__)), (id,)).fetchone()
+        if row is None:
+            return None
+        return self.build(cls, row)
+
+    def get_many(self, cls, ids: Iterable[str]) -> List[TypeVar('Base')]:
+        """ Return the objects found among `ids`, in their order, with one
+        SELECT per BATCH_SIZE ids
+        """
+        self.columns(cls)
+        ids = list(ids)
+        found = {}
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            sql = "SELECT * FROM {} WHERE id IN ({})".format(
+                quote(cls.__name__), ", ".join("?" * len(batch)))
+            for row in self.connection().execute(sql, batch):
+                found[row['id']] = self.build(cls, row)
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        Attributes stored in a column are matched in SQL, the others
+        (e.g. properties) on the built objects
+        """
+        columns = self.columns(cls)
+        clauses = []
+        params = []
+        others = {}
+        for k, v in attributes.items():
+            if k in columns:
+                clauses.append("{} IS ?".format(quote(k)))
+                params.append(to_sql(v))
+            else:
+                others[k] = v
+        sql = "SELECT * FROM {}".format(quote(cls.__name__))
+        if len(clauses) > 0:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY rowid"
+        result = []
+        for row in self.connection().execute(sql, params):
+            obj = self.build(cls, row)
+            if all(getattr(obj, k) == v for k, v in others.items()):
+                result.append(obj)
+        return result
+
+    @staticmethod
+    def sort_column(cls, attribute: str) -> str:
+        """ Return the SQL expression `attribute` is ordered by: its
+        column, casefolded for the `casefold_attributes`
+        """
+        if attribute in cls.casefold_attributes:
+            return "casefold({})".format(quote(attribute))
+        return quote(attribute)
+
+    def compile(self, query: Query) -> tuple:
+        """ Translate `query` to (sql, params, predicates left to check on
+        the built objects, ordered in SQL)
+        """
+        columns = self.columns(query.cls)
+        clauses = []
+        params = []
+        others = []
+        for predicate in query.predicates:
+            column = quote(predicate.attribute)
+            value = to_sql(predicate.value)
+            if predicate.attribute not in columns:
+                others.append(predicate)
+            elif predicate.op == '==':
+                clauses.append("{} IS ?".format(column))
+                params.append(value)
+            elif predicate.op == '!=':
+                clauses.append("{} IS NOT ?".format(column))
+                params.append(value)
+            elif predicate.op in RANGE_OPERATORS and value is not None:
+                clauses.append("{} {} ?".format(column, predicate.op))
+                params.append(value)
+            elif predicate.op == 'contains' and type(value) is str:
+                clauses.append("instr({}, ?) > 0".format(column))
+                params.append(value)
+            elif predicate.op == 'icontains' and type(value) is str:
+                clauses.append("instr(casefold({}), ?) > 0".format(column))
+                params.append(value.casefold())
+            elif predicate.op == 'startswith' and type(value) is str:
+                if predicate.attribute in query.cls.casefold_attributes:
+                    column = self.sort_column(query.cls, predicate.attribute)
+                    value = value.casefold()
+                clauses.append("{0} >= ? AND {0} < ?".format(column))
+                params.extend([value, value + MAX_CHAR])
+                others.append(predicate)
+            elif predicate.op == 'istartswith' and type(value) is str:
+                column = "casefold({})".format(column)
+                value = value.casefold()
+                clauses.append("{0} >= ? AND {0} < ?".format(column))
+                params.extend([value, value + MAX_CHAR])
+                others.append(predicate)
+            else:
+                others.append(predicate)
+        ordered = query.order is None or query.order in columns
+        if query.position is not None and ordered:
+            clauses.append(self.position_clause(query, params))
+        sql = "SELECT * FROM {}".format(quote(query.cls.__name__))
+        if len(clauses) > 0:
+            sql += " WHERE " + " AND ".join(clauses)
+        if query.order is not None and ordered:
+            direction = "DESC" if query.descending else "ASC"
+            sql += " ORDER BY {0} {1}, id {1}".format(
+                self.sort_column(query.cls, query.order), direction)
+        else:
+            sql += " ORDER BY rowid"
+        return sql, params, others, ordered
+
+    def position_clause(self, query: Query, params: list) -> str:
+        """ Return the clause keeping the rows after the position of
+        `query` in (ordering column, id) order, NULL first, adding its
+        parameters to `params`
+        """
+        (value_key, value), obj_id = query.position
+        column = self.sort_column(query.cls, query.order)
+        if value is None:
+            if query.descending:
+                params.append(obj_id)
+                return "({} IS NULL AND id < ?)".format(column)
+            params.append(obj_id)
+            return "({} IS NOT NULL OR id > ?)".format(column)
+        value = to_sql(value)
+        params.extend([value, value, obj_id])
+        if query.descending:
+            return "({0} < ? OR ({0} = ? AND id < ?) OR {0} IS NULL)".format(
+                column)
+        return "({0} > ? OR ({0} = ? AND id > ?))".format(column)
+
+    def plan(self, query: Query) -> tuple:
+        """ Return (description, candidate ids, ordered) for `query`
+        """
+        sql, params, others, ordered = self.compile(query)
+        return ("sql: {}".format(sql), None, ordered)
+
+    def execute(self, query: Query) -> Iterator[TypeVar('Base')]:
+        """ Run `query` in SQL, slicing there too when every predicate
+        could be translated
+        """
+        sql, params, others, ordered = self.compile(query)
+        if len(others) == 0 and ordered:
+            if query.limit_count is not None or query.offset_count > 0:
+                sql += " LIMIT ? OFFSET ?"
+                limit = query.limit_count
+                params = params + [-1 if limit is None else limit,
+                                   query.offset_count]
+            rows = self.connection().execute(sql, params)
+            return (self.build(query.cls, row) for row in rows)
+        rows = self.connection().execute(sql, params)
+        objs = (obj for obj in (self.build(query.cls, row) for row in rows)
+                if all(p.test(getattr(obj, p.attribute)) for p in others))
+        return finish(query, objs, ordered)
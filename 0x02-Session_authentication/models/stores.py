@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+""" Object stores module
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Iterable, Iterator, Tuple, TypeVar
+import mmap
+import os
+import threading
+from models.serializers import BinarySerializer, U16, U32
+
+
+OP_REMOVE = 0
+OP_SAVE = 1
+
+
+class LazyStore(MutableMapping):
+    """ Mapping of id to object keeping the raw stored records and
+    building each object only the first time it is returned
+    """
+
+    def __init__(self, factory: Callable, timestamps: tuple = ()):
+        """ Initialize an empty store building objects with `factory`
+        """
+        self._factory = factory
+        self._timestamps = timestamps
+        self._items = {}
+
+    def add_raw(self, record: dict):
+        """ Store the raw attributes of one object without building it
+        """
+        self._items[record['id']] = record
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return the object `obj_id`, building it if needed
+        """
+        value = self._items[obj_id]
+        if type(value) is dict:
+            value = self._factory(**value)
+            self._items[obj_id] = value
+        return value
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Store an object
+        """
+        self._items[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        del self._items[obj_id]
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids, building nothing
+        """
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        """ Number of objects, building nothing
+        """
+        return len(self._items)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Membership test, building nothing
+        """
+        return obj_id in self._items
+
+    def is_materialized(self, obj_id: str) -> bool:
+        """ Whether the object `obj_id` has been built
+        """
+        return type(self._items.get(obj_id)) is not dict
+
+    def peek(self, obj_id: str, attribute: str, raw: bool = False):
+        """ Return an attribute of an object without building it, a
+        timestamp as stored (not parsed) if `raw`
+        """
+        value = self._items[obj_id]
+        if type(value) is not dict:
+            return getattr(value, attribute)
+        if attribute not in value:
+            return getattr(self[obj_id], attribute)
+        if attribute in self._timestamps and not raw:
+            return self._factory.parse_timestamp(value[attribute])
+        return value[attribute]
+
+    def record(self, obj_id: str) -> dict:
+        """ Return the stored attributes of an object without building it
+        """
+        value = self._items[obj_id]
+        if type(value) is dict:
+            return value
+        return value.to_record()
+
+
+class DiskStore(MutableMapping):
+    """ Mapping of id to object backed by an append-only, memory-mapped
+    data file, with an id to offset index and a bounded LRU of built
+    objects
+    File layout: magic `BDS1`, then records made of a u32 payload length,
+    a u8 operation (save or remove) and the payload: the fields of the
+    object for a save, the u16-prefixed id for a remove
+    File accesses, the index and the LRU are guarded by one lock, as
+    appending may remap the file and compacting moves every record under
+    a concurrent reader
+    """
+
+    magic = b'BDS1'
+
+    def __init__(self, factory: Callable, file_path: str,
+                 cache_size: int = 1024, timestamps: tuple = ()):
+        """ Open (or create) the data file and index its live records
+        """
+        self._factory = factory
+        self._timestamps = timestamps
+        self._codec = BinarySerializer()
+        self.file_path = file_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._offsets = {}
+        self._dead = 0
+        self._map = None
+        self._lock = threading.RLock()
+        self._file = open(file_path, 'a+b')
+        if self._file.tell() == 0:
+            self._file.write(self.magic)
+            self._file.flush()
+        self._index()
+
+    def _buffer(self, end: int):
+        """ Return a memory map of the data file covering `end` bytes
+        """
+        if self._map is None or len(self._map) < end:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        return self._map
+
+    def _records(self) -> Iterator[Tuple[int, int, int]]:
+        """ Yield (offset, op, payload offset) for every complete record
+        """
+        end = os.path.getsize(self.file_path)
+        if end <= len(self.magic):
+            return
+        buf = self._buffer(end)
+        if buf[:len(self.magic)] != self.magic:
+            raise ValueError("{} is not a data file".format(self.file_path))
+        offset = len(self.magic)
+        while offset + 5 <= end:
+            size = U32.unpack_from(buf, offset)[0]
+            if offset + 5 + size > end:
+                break
+            yield offset, buf[offset + 4], offset + 5
+            offset += 5 + size
+
+    def _index(self):
+        """ Build the id to offset index by scanning the data file, then
+        publish it at once
+        """
+        offsets = {}
+        dead = 0
+        for offset, op, payload in self._records():
+            if op == OP_SAVE:
+                obj_id = self._codec.decode_fields(self._map, payload)['id']
+            else:
+                size = U16.unpack_from(self._map, payload)[0]
+                obj_id = str(self._map[payload + 2:payload + 2 + size],
+                             'utf-8')
+            if obj_id in offsets:
+                del offsets[obj_id]
+                dead += 1
+            if op == OP_SAVE:
+                offsets[obj_id] = offset
+            else:
+                dead += 1
+        self._offsets = offsets
+        self._dead = dead
+
+    def _append(self, op: int, payload: bytes) -> int:
+        """ Append one record, return its offset
+        """
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(U32.pack(len(payload)) + bytes([op]) + payload)
+            self._file.flush()
+            return offset
+
+    def _read(self, offset: int) -> dict:
+        """ Decode the fields of the save record at `offset`
+        """
+        with self._lock:
+            buf = self._buffer(offset + 5)
+            size = U32.unpack_from(buf, offset)[0]
+            buf = self._buffer(offset + 5 + size)
+            return self._codec.decode_fields(buf, offset + 5)
+
+    def _read_id(self, obj_id: str) -> dict:
+        """ Decode the fields of the live record of `obj_id`, its offset
+        being looked up under the same lock as the read so that a
+        compaction cannot move it in between
+        Raise a KeyError if there is none
+        """
+        with self._lock:
+            return self._read(self._offsets[obj_id])
+
+    def _cache_put(self, obj_id: str, obj: TypeVar('Base')):
+        """ Keep `obj` in the LRU, evicting the least recently used one
+        """
+        self._cache[obj_id] = obj
+        self._cache.move_to_end(obj_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return the object `obj_id`, from the LRU or from the file
+        """
+        with self._lock:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                self._cache.move_to_end(obj_id)
+                return obj
+            obj = self._factory(**self._read_id(obj_id))
+            self._cache_put(obj_id, obj)
+            return obj
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Append the current state of `obj` to the file
+        """
+        payload = self._codec.encode_fields(obj.to_record())
+        with self._lock:
+            if obj_id in self._offsets:
+                del self._offsets[obj_id]
+                self._dead += 1
+            self._offsets[obj_id] = self._append(OP_SAVE, payload)
+            self._cache_put(obj_id, obj)
+            self._maybe_compact()
+
+    def __delitem__(self, obj_id: str):
+        """ Append a tombstone for `obj_id`
+        """
+        data = obj_id.encode('utf-8')
+        with self._lock:
+            del self._offsets[obj_id]
+            self._cache.pop(obj_id, None)
+            self._append(OP_REMOVE, U16.pack(len(data)) + data)
+            self._dead += 2
+            self._maybe_compact()
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids, in file order
+        """
+        return iter(list(self._offsets))
+
+    def __len__(self) -> int:
+        """ Number of live objects
+        """
+        return len(self._offsets)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Membership test, reading nothing
+        """
+        return obj_id in self._offsets
+
+    def peek(self, obj_id: str, attribute: str, raw: bool = False):
+        """ Return an attribute of an object, reading its record from the
+        file if it is not cached, a timestamp as stored (not parsed) if
+        `raw`
+        """
+        obj = self._cache.get(obj_id)
+        if obj is not None:
+            return getattr(obj, attribute)
+        values = self._read_id(obj_id)
+        if attribute not in values:
+            return getattr(self[obj_id], attribute)
+        if attribute in self._timestamps and not raw:
+            return self._factory.parse_timestamp(values[attribute])
+        return values[attribute]
+
+    def record(self, obj_id: str) -> dict:
+        """ Return the stored attributes of an object
+        """
+        obj = self._cache.get(obj_id)
+        if obj is not None:
+            return obj.to_record()
+        return self._read_id(obj_id)
+
+    def stream(self) -> Iterator[TypeVar('Base')]:
+        """ Yield every live object in file order, without filling the LRU
+        """
+        for obj_id in self:
+            obj = self._cache.get(obj_id)
+            if obj is None:
+                try:
+                    obj = self._factory(**self._read_id(obj_id))
+                except KeyError:
+                    continue
+            yield obj
+
+    def _maybe_compact(self):
+        """ Compact the file once dead records outnumber live ones
+        """
+        if self._dead > 1024 and self._dead > len(self._offsets):
+            self.compact()
+
+    def compact(self, fsync: bool = False):
+        """ Rewrite the file with only the live records
+        """
+        with self._lock:
+            tmp_path = "{}.tmp".format(self.file_path)
+            with open(tmp_path, 'wb') as f:
+                f.write(self.magic)
+                for obj_id in self:
+                    payload = self._codec.encode_fields(self.record(obj_id))
+                    f.write(U32.pack(len(payload)) + bytes([OP_SAVE]) +
+                            payload)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.close()
+            os.replace(tmp_path, self.file_path)
+            self._file = open(self.file_path, 'a+b')
+            self._index()
+
+    def close(self):
+        """ Release the memory map and the file
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def peek(store, obj_id: str, attribute: str, raw: bool = False):
+    """ Return an attribute of a stored object, building it only if the
+    store cannot answer from its raw record (then a timestamp may be
+    returned as stored if `raw`)
+    """
+    if isinstance(store, (LazyStore, DiskStore)):
+        return store.peek(obj_id, attribute, raw)
+    return getattr(store[obj_id], attribute)
+
+
+def peek_many(store, ids: Iterable[str], attribute: str) -> Iterator[tuple]:
+    """ Yield (id, value of `attribute`) for the objects `ids` still in
+    the store
+    """
+    for obj_id in ids:
+        try:
+            yield obj_id, peek(store, obj_id, attribute)
+        except KeyError:
+            continue
+
+
+def records(store, ids: Iterable[str] = None) -> Iterator[dict]:
+    """ Yield the stored attributes of every object of a store, or of the
+    objects `ids` only
+    """
+    if isinstance(store, (LazyStore, DiskStore)):
+        for obj_id in list(store) if ids is None else ids:
+            try:
+                yield store.record(obj_id)
+            except KeyError:
+                continue
+        return
+    if ids is None:
+        objs = list(store.values())
+    else:
+        objs = [obj for obj in map(store.get, ids) if obj is not None]
+    for obj in objs:
+        yield obj.to_record()
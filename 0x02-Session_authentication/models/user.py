@@ -2,13 +2,38 @@
 """ User module
 """
 import hashlib
+from typing import List, TypeVar
 from models.base import Base
 
 
+def email_domain(email: str) -> str:
+    """ Return the domain of an email, lower case, None if it has none
+    """
+    if type(email) is not str or '@' not in email:
+        return None
+    return email.rsplit('@', 1)[1].lower() or None
+
+
+def signup_day(created_at: str) -> str:
+    """ Return the day (YYYY-MM-DD) of the text of a creation date
+    """
+    return created_at[:10]
+
+
 class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    indexed_attributes = ('email',)
+    sorted_attributes = ('created_at', 'email')
+    casefold_attributes = ('email',)
+    ngram_attributes = ('first_name', 'last_name')
+    aggregates = {
+        'users_by_email_domain': ('email', email_domain),
+        'users_by_signup_day': ('created_at', signup_day),
+    }
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -43,6 +68,26 @@ class User(Base):
         pwd_e = pwd.encode()
         return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
 
+    @classmethod
+    def search_text(cls, text: str, limit: int) -> List[TypeVar('User')]:
+        """ Return at most `limit` users whose email starts with `text`, in
+        email order, then users whose first or last name contains `text`
+        (from 3 characters), ignoring case
+        """
+        users = cls.query().filter('email', 'istartswith', text) \
+            .order_by('email').limit(limit).all()
+        if len(text.casefold()) < 3:
+            return users
+        found = {user.id for user in users}
+        for attribute in ('first_name', 'last_name'):
+            for user in cls.query().filter(attribute, 'icontains', text):
+                if len(users) >= limit:
+                    return users
+                if user.id not in found:
+                    found.add(user.id)
+                    users.append(user)
+        return users
+
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
         """
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" Shared fixtures of the tests
+"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import backends, base  # noqa: E402
+from models.stores import DiskStore  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+STATE = (backends.DATA, backends.INDEXES, backends.SORTED_INDEXES,
+         backends.NGRAM_INDEXES, backends.NGRAM_BUILDS, backends.JOURNALS,
+         backends.FLUSHERS, backends.SNAPSHOTS, backends.SHARDS,
+         backends.VERSIONS, backends.AGGREGATES, base.BACKENDS,
+         base.JSON_CACHES)
+
+
+def reset():
+    """ Forget every stored object, index and backend
+    """
+    for flusher in list(backends.FLUSHERS.values()):
+        if flusher is not None:
+            flusher.stop()
+    for store in backends.DATA.values():
+        if isinstance(store, DiskStore):
+            store.close()
+    for state in STATE:
+        state.clear()
+
+
+@pytest.fixture
+def user_class(tmp_path, monkeypatch):
+    """ The User class, with empty storage in a temporary directory:
+    tests change its configuration with monkeypatch
+    """
+    monkeypatch.chdir(tmp_path)
+    reset()
+    monkeypatch.setattr(User, 'sqlite_path', str(tmp_path / 'db.sqlite3'))
+    yield User
+    reset()
+
+
+@pytest.fixture
+def client(user_class, monkeypatch):
+    """ Test client of the API, without authentication
+    """
+    from api.v1 import app
+    monkeypatch.setattr(app, 'auth', None)
+    user_class.load_from_file()
+    return app.app.test_client()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" Tests of the aggregates of the users
+"""
+from collections import Counter
+import pytest
+from models import backends
+
+
+def recount(user_class) -> dict:
+    """ Users by email domain, counted by scanning them
+    """
+    return dict(Counter(user.email.rsplit('@', 1)[1]
+                        for user in user_class.all()))
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_counts_follow_writes(user_class, monkeypatch, backend):
+    """ Saves, edits, duplicates in a batch and removals keep the counts
+    exact
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    users = [user_class(email="u{}@d{}.io".format(i, i % 3))
+             for i in range(12)]
+    user_class.save_many(users + users[:2])
+    users[0].email = "u0@d9.io"
+    users[1].email = "u1@d9.io"
+    user_class.save_many([users[0], users[1], users[0]])
+    users[2].remove()
+    user_class.remove_many(users[3:5])
+    assert user_class.aggregate('users_by_email_domain') == \
+        recount(user_class)
+    days = user_class.aggregate('users_by_signup_day')
+    assert days == {users[5].created_at.date().isoformat(): 9}
+
+
+def test_counts_keep_no_group_per_object(user_class):
+    """ The previous group of an object is read from the index on its
+    attribute
+    """
+    user_class.load_from_file()
+    user_class.save_many(user_class(email="u{}@x.io".format(i))
+                         for i in range(10))
+    for count in backends.AGGREGATES['User'].values():
+        assert count.index is not None
+        assert count._groups is None
+
+
+def test_signup_days_of_a_lazy_load(user_class, monkeypatch):
+    """ Signup days are counted from the stored creation dates
+    """
+    monkeypatch.setattr(user_class, 'lazy', True)
+    user_class.load_from_file()
+    user_class.save_many(
+        user_class(email="u{}@x.io".format(i),
+                   created_at="2026-02-0{}T23:59:59".format(1 + i % 2))
+        for i in range(5))
+    user_class.load_from_file()
+    assert user_class.aggregate('users_by_signup_day') == \
+        {'2026-02-01': 3, '2026-02-02': 2}
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_largest_groups(user_class, monkeypatch, backend):
+    """ A limit keeps the largest groups only
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    user_class.save_many(user_class(email="u{}@d{}.io".format(i, i % 4))
+                         for i in range(10))
+    assert user_class.aggregate('users_by_email_domain', 2) == \
+        {'d0.io': 3, 'd1.io': 3}
+
+
+def test_stats_are_bounded(client, monkeypatch):
+    """ /stats returns the STATS_GROUPS largest groups of each aggregate
+    """
+    from api.v1.views import index
+    from models.user import User
+    monkeypatch.setattr(index, 'STATS_GROUPS', 1)
+    User.save_many(User(email="u{}@d{}.io".format(i, min(i, 2)))
+                   for i in range(5))
+    stats = client.get("/api/v1/stats").get_json()
+    assert stats['users'] == 5
+    assert stats['users_by_email_domain'] == {'d2.io': 3}
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+""" Tests of the authentication of the API
+"""
+import base64
+import pytest
+from api.v1.auth.auth import Auth
+from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.credential_cache import CredentialCache
+from api.v1.auth.path_matcher import PathMatcher
+from api.v1.auth.policies import DEFAULT_POLICY, PUBLIC_POLICY, \
+    resolve_policies
+
+
+def basic(email: str, password: str) -> str:
+    """ Authorization header of Basic credentials
+    """
+    token = "{}:{}".format(email, password).encode('utf-8')
+    return "Basic " + base64.b64encode(token).decode('ascii')
+
+
+@pytest.fixture
+def bob(user_class):
+    """ A saved user with the password `pwd`
+    """
+    user_class.load_from_file()
+    user = user_class(email="bob@x.io")
+    user.password = "pwd"
+    user.save()
+    return user
+
+
+@pytest.fixture
+def api(client, monkeypatch):
+    """ The API module, with a test client, whose authentication tests
+    configure with `api.use(auth_type, auth)`
+    """
+    from api.v1 import app
+
+    def use(auth_type: str, auth: Auth):
+        monkeypatch.setattr(app, 'auth_type', auth_type)
+        monkeypatch.setattr(app, 'auth', auth)
+    app.use = use
+    app.client = client
+    yield app
+    del app.use, app.client
+
+
+@pytest.mark.parametrize('path, excluded', [
+    ("/api/v1/status", True),
+    ("/api/v1/status/", True),
+    ("/api/v1/stat", False),
+    ("/api/v1/statuses", False),
+    ("/api/v1/users", False),
+    ("/api/v1/auth_session/login", True),
+    ("/api/v1/auth_session/login/x", True),
+])
+def test_path_matcher(path, excluded):
+    """ Exact paths ignore trailing slashes, `*` matches any suffix
+    """
+    matcher = PathMatcher(["/api/v1/status/", "/api/v1/auth_session/*"])
+    assert matcher.match(path) is excluded
+    assert Auth().require_auth(path, list(matcher)) is not excluded
+
+
+def test_require_auth_without_excluded_paths():
+    """ Everything requires authentication without excluded paths, and
+    everything is excluded by `*`
+    """
+    assert Auth().require_auth(None, ["/api/v1/status"])
+    assert Auth().require_auth("/api/v1/status", None)
+    assert Auth().require_auth("/api/v1/status", [])
+    assert not Auth().require_auth("/anything", ["*"])
+
+
+def test_policies_of_the_routes(api):
+    """ Routes are authenticated unless declared public, and logout only
+    accepts sessions
+    """
+    policies = resolve_policies(api.app)
+    assert policies['app_views.status'] is PUBLIC_POLICY
+    assert policies['app_views.login'] is PUBLIC_POLICY
+    assert policies['app_views.view_all_users'] is DEFAULT_POLICY
+    assert policies['app_views.logout'].allows('session_auth')
+    assert not policies['app_views.logout'].allows('basic_auth')
+
+
+def test_basic_auth(api, bob, monkeypatch):
+    """ Public routes need no credentials, the others valid ones, and the
+    session-only routes a session
+    """
+    monkeypatch.setattr(BasicAuth, 'credential_cache', CredentialCache())
+    api.use('basic_auth', BasicAuth())
+    client = api.client
+    assert client.get("/api/v1/status").status_code == 200
+    assert client.get("/api/v1/users").status_code == 401
+    headers = {'Authorization': basic("bob@x.io", "wrong")}
+    assert client.get("/api/v1/users", headers=headers).status_code == 403
+    headers = {'Authorization': basic("bob@x.io", "pwd")}
+    response = client.get("/api/v1/users", headers=headers)
+    assert response.status_code == 200
+    assert [user['id'] for user in response.get_json()] == [bob.id]
+    assert client.delete("/api/v1/auth_session/logout",
+                         headers=headers).status_code == 401
+
+
+def test_session_auth(api, bob, monkeypatch):
+    """ A session opened by the public login route authenticates the
+    next requests until logout
+    """
+    from api.v1.auth.session_auth import SessionAuth
+    monkeypatch.setenv('SESSION_NAME', '_my_session_id')
+    monkeypatch.setattr(SessionAuth, 'user_id_by_session_id', {})
+    api.use('session_auth', SessionAuth())
+    client = api.client
+    assert client.get("/api/v1/users/me").status_code == 401
+    response = client.post("/api/v1/auth_session/login",
+                           data={'email': "bob@x.io", 'password': "pwd"})
+    assert response.status_code == 200
+    assert client.get("/api/v1/users/me").get_json()['id'] == bob.id
+    assert client.delete("/api/v1/auth_session/logout").status_code == 200
+    assert client.get("/api/v1/users/me").status_code == 403
+
+
+def test_credential_cache_answers_verified_headers(bob, monkeypatch):
+    """ A cached header is answered without checking the password
+    """
+    auth = BasicAuth()
+    monkeypatch.setattr(BasicAuth, 'credential_cache', CredentialCache())
+    header = basic("bob@x.io", "pwd")
+    checks = []
+    is_valid_password = type(bob).is_valid_password
+
+    def check(user, pwd):
+        checks.append(pwd)
+        return is_valid_password(user, pwd)
+    monkeypatch.setattr(type(bob), 'is_valid_password', check)
+
+    class Request():
+        headers = {'Authorization': header}
+    assert auth.current_user(Request()).id == bob.id
+    assert auth.current_user(Request()).id == bob.id
+    assert checks == ["pwd"]
+
+
+def test_credential_cache_invalidation(bob):
+    """ A new password or email, a removal and the TTL invalidate an
+    entry; the cache keeps `size` entries and no credentials
+    """
+    cache = CredentialCache(size=2)
+    header = basic("bob@x.io", "pwd")
+    cache.add(header, bob)
+    assert cache.get(header) is bob
+    assert all(header.encode() not in key for key in cache._entries)
+    bob.password = "new"
+    bob.save()
+    assert cache.get(header) is None
+    cache.add(header, bob)
+    bob.remove()
+    assert cache.get(header) is None
+    expired = CredentialCache(ttl=-1)
+    expired.add(header, bob)
+    assert expired.get(header) is None
+    disabled = CredentialCache(size=0)
+    disabled.add(header, bob)
+    assert disabled.get(header) is None
+
+
+def test_credential_cache_is_bounded(user_class):
+    """ The least recently used entries are dropped
+    """
+    user_class.load_from_file()
+    users = [user_class(email="u{}@x.io".format(i)) for i in range(3)]
+    user_class.save_many(users)
+    cache = CredentialCache(size=2)
+    headers = [basic(user.email, "pwd") for user in users]
+    cache.add(headers[0], users[0])
+    cache.add(headers[1], users[1])
+    assert cache.get(headers[0]) is users[0]
+    cache.add(headers[2], users[2])
+    assert cache.get(headers[1]) is None
+    assert cache.get(headers[0]) is users[0]
+    assert cache.get(headers[2]) is users[2]
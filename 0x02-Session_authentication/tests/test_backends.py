@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+""" Tests of the persistence of the storage backends
+"""
+import os
+import pytest
+from conftest import reset
+
+
+def snapshot(cls) -> dict:
+    """ Serialized form of every stored object, by id
+    """
+    return {obj.id: obj.to_json(True) for obj in cls.all()}
+
+
+def write_some(cls) -> dict:
+    """ Save, edit and remove users, and return what is stored then
+    """
+    cls.load_from_file()
+    users = [cls(email="u{}@x.io".format(i), first_name="U{}".format(i))
+             for i in range(20)]
+    cls.save_many(users)
+    users[0].last_name = "Edited"
+    users[0].save()
+    users[1].remove()
+    cls.remove_many(users[2:4])
+    cls(email="late@x.io").save()
+    return snapshot(cls)
+
+
+def restart(cls) -> dict:
+    """ Forget everything in memory and load the class again
+    """
+    reset()
+    cls.load_from_file()
+    return snapshot(cls)
+
+
+def test_journal_is_replayed_over_the_snapshot(user_class, monkeypatch):
+    """ Writes only in the journal are found again after a restart, and
+    the journal is then compacted into the snapshot
+    """
+    monkeypatch.setattr(user_class, 'journal', True)
+    monkeypatch.setattr(user_class, 'journal_compact_every', 10 ** 6)
+    written = write_some(user_class)
+    assert os.path.getsize(".db_User.journal") > 0
+    assert restart(user_class) == written
+    assert os.path.getsize(".db_User.journal") == 0
+    assert restart(user_class) == written
+
+
+def test_journal_compaction(user_class, monkeypatch):
+    """ A journal compacted while writing loses nothing
+    """
+    monkeypatch.setattr(user_class, 'journal', True)
+    monkeypatch.setattr(user_class, 'journal_compact_every', 3)
+    written = write_some(user_class)
+    assert restart(user_class) == written
+
+
+@pytest.mark.parametrize('serializer', ['json', 'binary'])
+@pytest.mark.parametrize('shards', [0, 4])
+def test_snapshot_round_trip(user_class, monkeypatch, serializer, shards):
+    """ Every serializer, sharded or not, reloads what was written
+    """
+    monkeypatch.setattr(user_class, 'serializer', serializer)
+    monkeypatch.setattr(user_class, 'shards', shards)
+    written = write_some(user_class)
+    assert restart(user_class) == written
+    if shards > 0:
+        assert user_class.has_shard_files()
+
+
+def test_sqlite_round_trip(user_class, monkeypatch):
+    """ The SQLite backend reloads what was written, indexes included
+    """
+    monkeypatch.setattr(user_class, 'backend', 'sqlite')
+    written = write_some(user_class)
+    assert restart(user_class) == written
+    assert [user.email for user in user_class.search({'email': "late@x.io"})
+            ] == ["late@x.io"]
+
+
+def test_write_behind_is_persisted_on_stop(user_class, monkeypatch):
+    """ Writes still pending in the write-behind queue are flushed when
+    the flusher stops
+    """
+    monkeypatch.setattr(user_class, 'write_behind', True)
+    monkeypatch.setattr(user_class, 'write_behind_interval', 3600)
+    monkeypatch.setattr(user_class, 'write_behind_batch_size', 10 ** 6)
+    written = write_some(user_class)
+    assert restart(user_class) == written
+
+
+def test_indexes_follow_a_reload(user_class, monkeypatch):
+    """ Indexes are rebuilt from the reloaded objects
+    """
+    monkeypatch.setattr(user_class, 'journal', True)
+    write_some(user_class)
+    restart(user_class)
+    assert user_class.search({'email': "u2@x.io"}) == []
+    found = user_class.search({'last_name': "Edited"})
+    assert [user.email for user in found] == ["u0@x.io"]
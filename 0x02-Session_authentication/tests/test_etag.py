@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Tests of the ETags of the users API
+"""
+import pytest
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_etag_changes_with_an_edit_in_the_same_second(client, user_class,
+                                                      monkeypatch, backend):
+    """ A PUT right after a GET makes the old ETag stale
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    user = user_class(email="bob@hbtn.io", first_name="Bob")
+    user.save()
+    url = "/api/v1/users/{}".format(user.id)
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code \
+        == 304
+    assert client.put(url, json={'first_name': "Rob"}).status_code == 200
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['first_name'] == "Rob"
+    assert response.headers['ETag'] != etag
+
+
+def test_sqlite_keeps_microseconds(user_class, monkeypatch):
+    """ Timestamps read back from SQLite are the saved ones
+    """
+    monkeypatch.setattr(user_class, 'backend', 'sqlite')
+    user_class.load_from_file()
+    user = user_class(email="bob@hbtn.io")
+    user.save()
+    stored = user_class.get(user.id)
+    assert stored.updated_at == user.updated_at
+    assert stored.etag() == user.etag()
+
+
+def test_binary_records_keep_microseconds(user_class, monkeypatch):
+    """ Timestamps read back from the out-of-core data file are the saved
+    ones
+    """
+    monkeypatch.setattr(user_class, 'out_of_core', True)
+    monkeypatch.setattr(user_class, 'cache_size', 1)
+    user_class.load_from_file()
+    user = user_class(email="bob@hbtn.io")
+    user.save()
+    user_class(email="other@hbtn.io").save()
+    stored = user_class.get(user.id)
+    assert stored is not user
+    assert stored.updated_at == user.updated_at
+    assert stored.etag() == user.etag()
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+@pytest.mark.parametrize('query', ["", "?limit=2", "?stream=1"])
+def test_collection_etag_changes_with_any_write(client, user_class,
+                                                monkeypatch, backend, query):
+    """ The ETag of the list of users is stable while nothing is written
+    and changes with a save or a remove, even in the same second
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    user = user_class(email="bob@hbtn.io")
+    user.save()
+    url = "/api/v1/users" + query
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code \
+        == 304
+    assert client.get("/api/v1/users?limit=3").headers['ETag'] != etag
+    user_class(email="al@hbtn.io").save()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    user.remove()
+    assert client.get(url, headers={'If-None-Match': etag}).status_code \
+        == 200
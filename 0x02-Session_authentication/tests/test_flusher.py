@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+""" Tests of the write-behind flusher
+"""
+import logging
+import pytest
+from models.flusher import WriteBehindFlusher
+
+
+class FailingFlush():
+    """ Flush function failing its first `failures` calls
+    """
+
+    def __init__(self, failures: int):
+        """ Initialize the flush
+        """
+        self.failures = failures
+        self.calls = 0
+        self.done = 0
+
+    def __call__(self, fsync: bool):
+        """ Fail or count one flush
+        """
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError("disk full")
+        self.done += 1
+
+
+def test_failed_flush_is_logged_and_retried_by_stop(caplog):
+    """ A flush failing in the thread is logged, then retried by stop()
+    """
+    flush = FailingFlush(1)
+    flusher = WriteBehindFlusher(flush, durability='none', batch_size=10)
+    with caplog.at_level(logging.ERROR, logger='models.flusher'):
+        for _ in range(3):
+            flusher.mark_dirty()
+        flusher.stop()
+    assert flush.calls == 2
+    assert flush.done == 1
+    assert "write-behind flush of 3 mutations failed" in caplog.text
+
+
+def test_stop_raises_instead_of_dropping_mutations(caplog):
+    """ stop() raises while the mutations cannot be flushed, and keeps
+    them for the next stop()
+    """
+    flush = FailingFlush(2)
+    flusher = WriteBehindFlusher(flush, durability='none', batch_size=10)
+    with caplog.at_level(logging.ERROR, logger='models.flusher'):
+        flusher.mark_dirty()
+        with pytest.raises(OSError):
+            flusher.stop()
+    assert flush.done == 0
+    flusher.stop()
+    assert flush.done == 1
+    flusher.stop()
+    assert flush.calls == 3
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Tests of the sorted indexes on timestamps
+"""
+from datetime import datetime
+import pytest
+
+
+STORES = {
+    'eager': {},
+    'lazy': {'lazy': True},
+    'out_of_core': {'out_of_core': True, 'cache_size': 2},
+}
+
+
+def configure(user_class, monkeypatch, store):
+    """ Select the store of the users
+    """
+    for name, value in STORES[store].items():
+        monkeypatch.setattr(user_class, name, value)
+
+
+def expected(users, low=None):
+    """ Ids of `users` in (created_at, id) order, from `low` on
+    """
+    users = [user for user in users if low is None or user.created_at >= low]
+    users.sort(key=lambda user: (user.created_at, user.id))
+    return [user.id for user in users]
+
+
+@pytest.mark.parametrize('store', list(STORES))
+def test_pages_follow_creation_order(user_class, monkeypatch, store):
+    """ Pages and ranges on created_at are in order, whether the index
+    holds stored strings (loaded records) or datetimes (saved objects)
+    """
+    configure(user_class, monkeypatch, store)
+    user_class.load_from_file()
+    user_class.save_many(
+        user_class(email="u{}@x.io".format(i),
+                   created_at="2026-01-{:02d}T00:00:00".format(10 - i % 7))
+        for i in range(30))
+    user_class.load_from_file()
+    user_class.save_many([
+        user_class(email="micro@x.io",
+                   created_at=datetime(2026, 1, 5, 0, 0, 0, 500)),
+        user_class(email="now@x.io"),
+    ])
+    users = [user_class.get(user.id) for user in user_class.all()]
+    ids, cursor = [], None
+    while True:
+        page, cursor = user_class.page(7, cursor)
+        ids.extend(user.id for user in page)
+        if cursor is None:
+            break
+    assert ids == expected(users)
+    low = datetime(2026, 1, 5)
+    query = user_class.query().filter('created_at', '>=', low) \
+        .order_by('created_at')
+    assert query.explain() == "sorted index >= on created_at"
+    assert [user.id for user in query] == expected(users, low)
+
+
+def test_lazy_load_does_not_parse_timestamps(user_class, monkeypatch):
+    """ Loading a lazy store indexes the stored timestamps as they are
+    """
+    monkeypatch.setattr(user_class, 'lazy', True)
+    user_class.load_from_file()
+    user_class.save_many(user_class(email="u{}@x.io".format(i))
+                         for i in range(20))
+    parsed = []
+    parse_timestamp = user_class.parse_timestamp
+
+    def parse(value):
+        parsed.append(value)
+        return parse_timestamp(value)
+    monkeypatch.setattr(user_class, 'parse_timestamp', staticmethod(parse))
+    user_class.load_from_file()
+    assert parsed == []
+    assert len(user_class.page(5)[0]) == 5
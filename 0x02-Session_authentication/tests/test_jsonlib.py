@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+""" Tests of the JSON libraries
+"""
+import pytest
+from models.jsonlib import get_json, orjson
+
+
+DOCUMENTS = [
+    {'email': "bob@x.io", 'first_name': None, 'admin': False, 'n': 3},
+    ["é", "\x7f", {"b": 1, "a": [1.5, -2]}],
+]
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('compact', [True, False])
+def test_orjson_writes_the_text_of_the_json_module(document, compact):
+    """ Both libraries write the same text
+    """
+    assert get_json('orjson').dumps(document, sort_keys=True,
+                                    compact=compact) == \
+        get_json('stdlib').dumps(document, sort_keys=True, compact=compact)
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_documented_float_differences():
+    """ Exponents and non-finite floats are written differently
+    """
+    values = [1e16, float('nan'), float('inf')]
+    assert get_json('orjson').dumps(values, compact=True) == \
+        "[1e16,null,null]"
+    assert get_json('stdlib').dumps(values, compact=True) == \
+        "[1e+16,NaN,Infinity]"
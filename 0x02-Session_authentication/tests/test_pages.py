@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Tests of the pages of the users API
+"""
+import base64
+import json
+import pytest
+
+
+def cursor_of(value, obj_id: str) -> str:
+    """ Build the cursor of a position
+    """
+    data = json.dumps([value, obj_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_pages_walk_every_user_once(client, user_class, monkeypatch,
+                                    backend):
+    """ Following next_cursor returns every user once, in creation order
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    users = [user_class(email="u{}@x.io".format(i)) for i in range(25)]
+    user_class.save_many(users)
+    ids, url = [], "/api/v1/users?limit=10"
+    while True:
+        body = client.get(url).get_json()
+        ids.extend(user['id'] for user in body['users'])
+        if body['next_cursor'] is None:
+            break
+        url = "/api/v1/users?limit=10&cursor={}".format(body['next_cursor'])
+    assert ids == [user.id for user in sorted(
+        users, key=lambda user: (user.created_at, user.id))]
+
+
+@pytest.mark.parametrize('limit', ["0", "-1", "1001", "ten"])
+def test_wrong_limits(client, limit):
+    """ The page size is between 1 and PAGE_SIZE_MAX
+    """
+    response = client.get("/api/v1/users?limit={}".format(limit))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Wrong limit"}
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+@pytest.mark.parametrize('cursor', [
+    cursor_of("2026-01-01T00:00:00+00:00", "x"),
+    cursor_of("not a date", "x"),
+    cursor_of("2026-01-01T00:00:00", 1),
+    "%%%",
+])
+def test_wrong_cursors(client, user_class, monkeypatch, backend, cursor):
+    """ Cursors that are not positions of a naive timestamp and an id are
+    rejected the same way by every backend
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    user_class(email="bob@x.io").save()
+    response = client.get("/api/v1/users?cursor={}".format(cursor))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Wrong cursor"}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+""" Tests of the text search of the users
+"""
+import time
+import pytest
+from models import backends
+from models.index import NgramIndex
+
+
+def wait_for_ngram_indexes(timeout: float = 10.0) -> dict:
+    """ Wait for the background build of the n-gram indexes of User
+    """
+    deadline = time.monotonic() + timeout
+    while not backends.NGRAM_INDEXES.get('User'):
+        assert time.monotonic() < deadline, "n-gram indexes not built"
+        time.sleep(0.01)
+    return backends.NGRAM_INDEXES['User']
+
+
+def names(users) -> list:
+    """ Sorted first names of `users`
+    """
+    return sorted(user.first_name for user in users)
+
+
+def test_ngram_indexes_are_built_without_blocking_writers(user_class,
+                                                          monkeypatch):
+    """ Writes made while the indexes are built are waited for by no one
+    and found by the searches once they are published
+    """
+    monkeypatch.setattr(user_class, 'lazy', True)
+    user_class.load_from_file()
+    users = [user_class(email="u{}@x.io".format(i),
+                        first_name="Name{}".format(i)) for i in range(50)]
+    user_class.save_many(users)
+    wait_for_ngram_indexes()
+    add_many = NgramIndex.add_many
+    written = []
+
+    def add_many_and_write(self, entries):
+        """ Write from the building thread, which would deadlock if it
+        held the publication lock
+        """
+        if not written:
+            written.append(True)
+            user = user_class.get(users[0].id)
+            user.first_name = "Renamed"
+            user.save()
+            user_class.get(users[1].id).remove()
+            user_class(email="new@x.io", first_name="Newcomer").save()
+        add_many(self, entries)
+    monkeypatch.setattr(NgramIndex, 'add_many', add_many_and_write)
+    user_class.load_from_file()
+    wait_for_ngram_indexes()
+    query = user_class.query().filter('first_name', 'icontains', 'ame')
+    assert query.explain() == "n-gram index on first_name"
+    assert names(query) == names(user for user in user_class.all()
+                                 if 'ame' in user.first_name.lower())
+    found = user_class.query().filter('first_name', 'icontains', 'comer')
+    assert names(found) == ["Newcomer"]
+    assert names(user_class.query().filter('first_name', 'icontains',
+                                           'name1')) == \
+        names(user for user in user_class.all()
+              if user.first_name.startswith("Name1"))
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_email_prefix_ignores_case(user_class, monkeypatch, backend):
+    """ The email prefix of a search ignores case like the names, and
+    emails are ordered ignoring case
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    user_class.save_many(user_class(email=email) for email in
+                         ["bob@x.io", "Bobby@x.io", "BOB2@x.io", "al@x.io",
+                          "bOb3@x.io"])
+    emails = [user.email for user in user_class.search_text("BoB", 3)]
+    assert emails == ["BOB2@x.io", "bOb3@x.io", "bob@x.io"]
+    emails = [user.email for user in user_class.search_text("bob", 10)]
+    assert emails == ["BOB2@x.io", "bOb3@x.io", "bob@x.io", "Bobby@x.io"]
+    if backend == 'memory':
+        query = user_class.query().filter('email', 'istartswith', "BO")
+        assert query.explain() == "sorted index istartswith on email"
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_pages_in_email_order(user_class, monkeypatch, backend):
+    """ Keyset pages on email follow the order ignoring case
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    emails = ["{}{}@x.io".format(c, i) for i in range(5) for c in "aAbB"]
+    user_class.save_many(user_class(email=email) for email in emails)
+    found, cursor = [], None
+    while True:
+        page, cursor = user_class.page(3, cursor, attribute='email')
+        found.extend(user.email for user in page)
+        if cursor is None:
+            break
+    assert [email.casefold() for email in found] == \
+        sorted(email.casefold() for email in emails)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+""" Tests of the lazy and out-of-core stores
+"""
+import threading
+
+
+def test_out_of_core_reads_during_compaction(user_class, monkeypatch):
+    """ Readers never see a stale offset while writers compact the file
+    """
+    monkeypatch.setattr(user_class, 'out_of_core', True)
+    monkeypatch.setattr(user_class, 'cache_size', 2)
+    user_class.load_from_file()
+    users = [user_class(email="u{}@x.io".format(i)) for i in range(300)]
+    user_class.save_many(users)
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            for user in users:
+                try:
+                    if user_class.get(user.id) is None:
+                        errors.append("missing {}".format(user.id))
+                except Exception as e:
+                    errors.append(repr(e))
+
+    def write():
+        for i in range(3000):
+            users[i % len(users)].save()
+        stop.set()
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert user_class.count() == 300
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Tests of the users API
+"""
+import pytest
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_bulk_create_reports_wrong_types_per_item(client, user_class,
+                                                  monkeypatch, backend):
+    """ Items with non-string attributes are reported, the others created
+    """
+    monkeypatch.setattr(user_class, 'backend', backend)
+    user_class.load_from_file()
+    response = client.post("/api/v1/users/bulk", json=[
+        {'email': "a@hbtn.io", 'password': "pwd"},
+        {'email': ["l"], 'password': "pwd"},
+        {'email': {'a': 1}, 'password': "pwd"},
+        {'email': "b@hbtn.io", 'password': 12},
+        {'email': "c@hbtn.io", 'password': "pwd", 'first_name': 3},
+        {'email': "d@hbtn.io"},
+    ])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert [user['email'] for user in body['created']] == ["a@hbtn.io"]
+    assert body['errors'] == [
+        {'index': 1, 'error': "Wrong email"},
+        {'index': 2, 'error': "Wrong email"},
+        {'index': 3, 'error': "Wrong password"},
+        {'index': 4, 'error': "Wrong first_name"},
+        {'index': 5, 'error': "password missing"},
+    ]
+    assert user_class.count() == 1
+    user_class.load_from_file()
+    assert user_class.count() == 1
+
+
+def test_create_rejects_wrong_types(client, user_class):
+    """ A user with a non-string email is not created
+    """
+    response = client.post("/api/v1/users",
+                           json={'email': ["l"], 'password': "pwd"})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Wrong email"}
+    assert user_class.count() == 0
+
+
+def cached(users) -> int:
+    """ Number of users holding a JSON cache
+    """
+    return sum(1 for user in users
+               if getattr(user, '_json_cache', None) is not None)
+
+
+def test_lists_and_streams_cache_nothing(client, user_class):
+    """ Listing or streaming every user leaves no JSON cache behind
+    """
+    users = [user_class(email="u{}@hbtn.io".format(i)) for i in range(50)]
+    user_class.save_many(users)
+    assert len(client.get("/api/v1/users").get_json()) == 50
+    assert len(client.get("/api/v1/users?stream=1").get_json()) == 50
+    assert cached(users) == 0
+
+
+def test_json_cache_is_bounded(client, user_class, monkeypatch):
+    """ Only the json_cache_size users read most recently keep a cache,
+    and a cached response is the same as a fresh one
+    """
+    monkeypatch.setattr(user_class, 'json_cache_size', 10)
+    users = [user_class(email="u{}@hbtn.io".format(i)) for i in range(50)]
+    user_class.save_many(users)
+    for user in users:
+        response = client.get("/api/v1/users/{}".format(user.id))
+        assert response.get_json() == user.to_json()
+    assert cached(users) == 10
+    assert cached(users[-10:]) == 10
+    user = users[-1]
+    first = client.get("/api/v1/users/{}".format(user.id)).get_data()
+    user.first_name = "Bob"
+    second = client.get("/api/v1/users/{}".format(user.id)).get_json()
+    assert second['first_name'] == "Bob" and first != second